@@ -1,6 +1,7 @@
 import logging
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 
 from app.src.config import SETTINGS
 from app.src.datamodels import (
@@ -9,17 +10,49 @@ from app.src.datamodels import (
     JobStatusEnum,
 )
 import app.src.datamodels as datamodels
-from app.src.model_train import model_train
-from app.src.model_predict import model_predict
+from app.src.executors import (
+    INFERENCE_EXECUTOR,
+    configure_torch_threads,
+    run_in_executor,
+)
+from app.src.micro_batcher import MICRO_BATCHER
+from app.src.model_predict import model_predict, model_predict_batch
+from app.src.model_predict_stream import (
+    NDJSON_MEDIA_TYPE,
+    NdjsonStreamingResponse,
+    stream_predictions,
+)
+from app.src.model_registry import ENGINE_TFIDF_LOGISTIC_REGRESSION, MODEL_REGISTRY
+from app.src.prediction_cache import PREDICTION_CACHE
+from app.src.training_jobs import (
+    TRAINING_JOB_MANAGER,
+    TrainingJobAlreadyRunningError,
+)
 from app.src.utils.monitoring.api_interactions_writer import (
     write_api_interactions_in_google_cloud_storage,
 )
 
 logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SETTINGS.inference_backend == "pytorch":
+        configure_torch_threads()
+    # load the model once per process instead of once per prediction,
+    # workers forked by app.serve inherit the model loaded before the fork
+    if not MODEL_REGISTRY.is_loaded():
+        MODEL_REGISTRY.load()
+    yield
+    await MICRO_BATCHER.close()
+    TRAINING_JOB_MANAGER.shutdown()
+    MODEL_REGISTRY.unload()
+
+
 app = FastAPI(
     title="Sentiment-Analysis",
     version="0.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -36,15 +69,34 @@ def root() -> dict:
 @app.post(
     "/model_training",
     summary="launch_training_service",
-    response_description="this service basically returns the sentiment analysis model training and evaluation.",
-    response_model=datamodels.TrainingOutput,
+    response_description="this service submits the sentiment analysis model training "
+    "as a background job and returns its job_id, "
+    "the training and evaluation outputs are then read from /model_training/{job_id}",
+    response_model=datamodels.TrainingJobOutput,
+    status_code=202,
     deprecated=False,
 )
-
 def launch_training(inputs: datamodels.TrainingInput):
-    
-    outputs = model_train(inputs=inputs)
-    return outputs
+    try:
+        return TRAINING_JOB_MANAGER.submit(inputs)
+    except TrainingJobAlreadyRunningError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get(
+    "/model_training/{job_id}",
+    summary="training job status",
+    response_description="this service returns the status, the progress and the timing "
+    "of a training job, and its TrainingOutput once completed",
+    response_model=datamodels.TrainingJobOutput,
+    deprecated=False,
+)
+def get_training_job(job_id: str):
+    job = TRAINING_JOB_MANAGER.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"training job not found : {job_id}")
+    return job
+
 
 @app.post(
     "/model_predict",
@@ -53,11 +105,69 @@ def launch_training(inputs: datamodels.TrainingInput):
     response_model=datamodels.ModelPredictOutput,
     deprecated=False,
 )
-def predict(inputs: datamodels.ModelPredictInput):
-    outputs = model_predict(inputs=inputs)
+async def predict(inputs: datamodels.ModelPredictInput):
+    loaded_model = MODEL_REGISTRY.peek()
+    # the linear model predicts a review in microseconds : batching would only add the wait
+    is_linear_model = (
+        loaded_model is not None and loaded_model.engine == ENGINE_TFIDF_LOGISTIC_REGRESSION
+    )
+    if SETTINGS.micro_batching_enabled and not is_linear_model:
+        # concurrent single predictions are grouped into one forward pass
+        outputs = await MICRO_BATCHER.submit(inputs)
+    else:
+        outputs = await run_in_executor(INFERENCE_EXECUTOR, model_predict, inputs=inputs)
+    return outputs
+
+
+@app.post(
+    "/model_predict_batch",
+    summary="predict the sentiment of a batch of reviews",
+    response_description="this service predicts the sentiment of each review "
+    "whether positive/negative, in the order of the posted reviews",
+    response_model=datamodels.ModelPredictBatchOutput,
+    deprecated=False,
+)
+async def predict_batch(inputs: datamodels.ModelPredictBatchInput):
+    outputs = await run_in_executor(
+        INFERENCE_EXECUTOR, model_predict_batch, inputs=inputs
+    )
     return outputs
 
 
+@app.post(
+    "/model_predict_stream",
+    summary="predict the sentiment of a stream of reviews",
+    response_description="this service streams back one ModelPredictOutput per line "
+    "of the newline-delimited json request body, in the same order",
+    response_class=NdjsonStreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                NDJSON_MEDIA_TYPE: {
+                    "schema": {"$ref": "#/components/schemas/ModelPredictInput"}
+                }
+            },
+            "required": True,
+        }
+    },
+    deprecated=False,
+)
+async def predict_stream(request: Request):
+    return NdjsonStreamingResponse(stream_predictions(request.stream()))
+
+
+@app.get(
+    "/model_predict/cache_stats",
+    summary="prediction cache statistics",
+    response_description="this service returns the hit/miss counters "
+    "of the prediction cache of the process",
+    response_model=datamodels.PredictionCacheStats,
+    deprecated=False,
+)
+def prediction_cache_stats():
+    return PREDICTION_CACHE.stats()
+
+
 @app.post(
     "/dummy",
     summary="launch_dummy_service",
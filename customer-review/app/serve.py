@@ -0,0 +1,212 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+
+from app.main import app
+from app.src.config import SETTINGS
+from app.src.executors import configure_torch_threads
+from app.src.model_registry import (
+    ENGINE_BERT,
+    MODEL_REGISTRY,
+    get_model_metadata_mtime,
+)
+from app.src.training_jobs import is_training_job_running, try_acquire_training_lock
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+_SOCKET_BACKLOG = 2048
+_WAIT_POLL_SECONDS = 0.5
+
+
+def _create_listening_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(_SOCKET_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _load_model_before_fork() -> None:
+    """
+    Notes :
+        the weights are loaded once in the parent and moved to shared memory,
+        forked workers then map the same pages instead of holding N copies.
+        gc.freeze keeps the garbage collector of the workers from writing into
+        the objects inherited from the parent, which would copy their pages.
+        an onnxruntime session starts its thread pools when it is created and
+        cannot be forked, with this backend each worker loads its own session.
+        called again in the parent when a training has saved a new model
+    """
+    # the workers never reload the model on their own, they would each hold a copy
+    MODEL_REGISTRY.follow_saved_model = False
+    if SETTINGS.inference_backend != "pytorch":
+        logging.warning(
+            f"inference_backend {SETTINGS.inference_backend} - "
+            f"the model is loaded by each worker"
+        )
+        return
+
+    import torch
+
+    # no torch thread pool must be running in the parent when it forks
+    torch.set_num_threads(1)
+    # the objects of the previous model may be collected again
+    gc.unfreeze()
+    if MODEL_REGISTRY.load() and MODEL_REGISTRY.peek().engine == ENGINE_BERT:
+        MODEL_REGISTRY.peek().model.share_memory()
+    gc.collect()
+    gc.freeze()
+
+
+def _run_worker(sock: socket.socket, intra_op_threads: int) -> None:
+    if SETTINGS.inference_backend == "pytorch":
+        configure_torch_threads(intra_op_threads=intra_op_threads)
+    config = uvicorn.Config(app, log_level=logging.getLevelName(logging.root.level).lower())
+    uvicorn.Server(config=config).run(sockets=[sock])
+
+
+def _fork_worker(sock: socket.socket, intra_op_threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            _run_worker(sock=sock, intra_op_threads=intra_op_threads)
+        except Exception as e:
+            logging.error(e, exc_info=True)
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    logging.info(f"worker {pid} started")
+    return pid
+
+
+def _stop_worker(pid: int) -> None:
+    # a stopped worker finishes the requests it is serving before it exits
+    try:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+    except (ProcessLookupError, ChildProcessError):
+        pass
+
+
+def _stop_worker_without_training(pid: int, is_shutting_down) -> bool:
+    """
+    Notes :
+        a stopped worker terminates the training job it runs. the node lock is
+        held while the worker is stopped : a training submitted to it after
+        the restart began either runs to its end first or is answered 409
+
+    Returns :
+        False if the server shuts down before the worker could be stopped
+    """
+    while True:
+        lock_file = try_acquire_training_lock()
+        if lock_file is not None:
+            break
+        if is_shutting_down():
+            return False
+        time.sleep(_WAIT_POLL_SECONDS)
+    try:
+        _stop_worker(pid)
+    finally:
+        lock_file.close()
+    return True
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    # the workers share the cores, unless the threads are set explicitly
+    intra_op_threads = SETTINGS.torch_intra_op_threads or max(
+        1, (os.cpu_count() or 1) // workers
+    )
+
+    sock = _create_listening_socket(host=host, port=port)
+    model_metadata_mtime = get_model_metadata_mtime(MODEL_REGISTRY.model_path)
+    _load_model_before_fork()
+    logging.info(f"serving app.main:app on http://{host}:{port} with {workers} workers")
+
+    worker_pids: Dict[int, int] = {}
+    for worker_index in range(workers):
+        worker_pids[_fork_worker(sock, intra_op_threads)] = worker_index
+
+    shutting_down = False
+
+    def _stop_workers(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop_workers)
+    signal.signal(signal.SIGINT, _stop_workers)
+
+    next_model_check = time.monotonic() + SETTINGS.model_refresh_interval_seconds
+    while worker_pids:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if not shutting_down and time.monotonic() >= next_model_check:
+                next_model_check = time.monotonic() + SETTINGS.model_refresh_interval_seconds
+                metadata_mtime = get_model_metadata_mtime(MODEL_REGISTRY.model_path)
+                # None while a training swaps the model directories. the
+                # restart waits for the training that saved the model to exit
+                if (
+                    metadata_mtime is not None
+                    and metadata_mtime != model_metadata_mtime
+                    and not is_training_job_running()
+                ):
+                    logging.info("new saved model - reloading it and restarting the workers")
+                    model_metadata_mtime = metadata_mtime
+                    _load_model_before_fork()
+                    # one worker at a time, each new worker started before the
+                    # previous one is stopped : the others keep serving meanwhile
+                    for worker_pid, worker_index in list(worker_pids.items()):
+                        if shutting_down:
+                            break
+                        # forked before the node lock is taken : it must not inherit it
+                        worker_pids[_fork_worker(sock, intra_op_threads)] = worker_index
+                        if not _stop_worker_without_training(worker_pid, lambda: shutting_down):
+                            break
+                        worker_pids.pop(worker_pid, None)
+                        logging.info(f"worker {worker_pid} replaced")
+            time.sleep(_WAIT_POLL_SECONDS)
+            continue
+        worker_index = worker_pids.pop(pid, None)
+        if worker_index is None:
+            continue
+        if shutting_down:
+            logging.info(f"worker {pid} stopped")
+        else:
+            # replace the dead worker, it inherits the same shared weights
+            logging.warning(f"worker {pid} exited with status {status} - restarting")
+            worker_pids[_fork_worker(sock, intra_op_threads)] = worker_index
+
+    sock.close()
+
+
+def _parse_args(args) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="pre-fork server for app.main:app sharing the model weights"
+    )
+    parser.add_argument("--host", default=SETTINGS.serving_host)
+    parser.add_argument("--port", type=int, default=SETTINGS.serving_port)
+    parser.add_argument("--workers", type=int, default=SETTINGS.serving_workers)
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    parsed_args = _parse_args(sys.argv[1:])
+    serve(host=parsed_args.host, port=parsed_args.port, workers=parsed_args.workers)
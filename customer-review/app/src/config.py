@@ -1,11 +1,14 @@
 import logging
 import os
 from pathlib import Path
-from typing import Union
+from typing import List, Union
 
 from pydantic import BaseSettings, root_validator, validator
 
-_AUTHORIZED_VALUES = {"test_api_server_type": ["test_starlette", "local", "cloud_run"]}
+_AUTHORIZED_VALUES = {
+    "test_api_server_type": ["test_starlette", "local", "cloud_run"],
+    "inference_backend": ["pytorch", "onnxruntime"],
+}
 
 
 class Settings(BaseSettings):
@@ -16,6 +19,34 @@ class Settings(BaseSettings):
     test_api_server_url: str = ""
     gcp_service_account_file: str = ""
     default_csv_separator: str = ","
+    predict_batch_size: int = 32
+    predict_stream_batch_size: int = 256
+    predict_stream_max_line_bytes: int = 65536
+    micro_batching_enabled: bool = True
+    micro_batch_max_size: int = 32
+    micro_batch_max_wait_ms: float = 5.0
+    prediction_cache_size: int = 10000
+    prediction_cache_ttl_seconds: float = 3600.0
+    quantized_inference: bool = False
+    bf16_inference: bool = False
+    inference_backend: str = "pytorch"
+    inference_workers: int = 1
+    torch_intra_op_threads: int = 0
+    torch_inter_op_threads: int = 0
+    serving_host: str = "127.0.0.1"
+    serving_port: int = 8000
+    serving_workers: int = 1
+    model_refresh_interval_seconds: float = 10.0
+    # finished training jobs and the checkpoints of failed runs, kept forever if <= 0
+    training_jobs_retention_days: float = 7.0
+    tokenization_cache_max_entries: int = 5
+    reviews_read_chunk_size: int = 100000
+    # seeds the splits, shuffles and samples of every training engine : a
+    # training submitted again draws the same ones
+    training_seed: int = 101
+    # training reviews files may only be read below this directory, or from these buckets
+    reviews_data_root: str = "app/data"
+    reviews_allowed_buckets: List[str] = []
 
     class Config:
         env_file = ".env"
@@ -38,6 +69,20 @@ class Settings(BaseSettings):
         else:
             return value
 
+    @validator("inference_backend", allow_reuse=True)
+    def inference_backend_must_be_in_authorized_values(cls, value):
+        authorized_values = _AUTHORIZED_VALUES["inference_backend"]
+
+        if value not in authorized_values:
+            raise ValueError(
+                "inference_backend not supported : "
+                + value
+                + " - authorized_values are : "
+                + ",".join(authorized_values)
+            )
+        else:
+            return value
+
     @root_validator
     def check_test_api_server_url(cls, values):
         server_type = values.get("test_api_server_type")
@@ -1,16 +1,22 @@
 from __future__ import annotations
-from typing import List
+import datetime
+from typing import List, Optional
 from enum import Enum
+import os
 
 import numpy as np
 import pandas as pd
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, root_validator, validator
+
+from app.src.config import SETTINGS
 
 
 JOB_STATUS_00_TO_RUN = "to_run"
 JOB_STATUS_01_LAUNCHED = "launched"
 JOB_STATUS_10_COMPLETED = "completed"
 JOB_STATUS_20_FAILED = "failed"
+# the model is a binary classifier : 0 negative, 1 positive
+SENTIMENTS = (0, 1)
 
 class DummyParameterEnum(str, Enum):
     value_00 = "value_00"
@@ -22,6 +28,16 @@ class JobStatusEnum(str, Enum):
     completed = JOB_STATUS_10_COMPLETED
     failed = JOB_STATUS_20_FAILED
 
+class EngineEnum(str, Enum):
+    bert = "bert"
+    tfidf_logistic_regression = "tfidf_logistic_regression"
+
+class ReviewsFileFormatEnum(str, Enum):
+    tsv = "tsv"
+    csv = "csv"
+    jsonl = "jsonl"
+    parquet = "parquet"
+
 class CustomerData(BaseModel):
     review: str = Field(default=None)
     sentiment: int = Field(description='sentiment of review', default=None)
@@ -29,15 +45,243 @@ class CustomerData(BaseModel):
     
 class ReviewsTable(BaseModel):
     data: List[CustomerData]
-    
-    
+
+
+class ReviewsColumns(BaseModel):
+    """
+    Notes :
+        columnar variant of ReviewsTable. the columns are checked as whole
+        arrays instead of one CustomerData model per review, which is what
+        dominates the parsing of a large training upload
+    """
+    review: list = Field(..., description='reviews')
+    sentiment: list = Field(..., description='sentiments of the reviews, 0 or 1')
+
+    class Config:
+        @staticmethod
+        def schema_extra(schema, model):
+            # the fields are bare lists so that pydantic does not validate item by item
+            schema['properties']['review']['items'] = {'type': 'string'}
+            schema['properties']['sentiment']['items'] = {'type': 'integer', 'enum': [0, 1]}
+
+    @validator('review')
+    def check_reviews_are_strings(cls, v):
+        if not v:
+            raise ValueError('at least one review is required')
+        if not all(isinstance(x, str) for x in v):
+            raise ValueError('reviews must be strings')
+        return v
+
+    @validator('sentiment')
+    def check_sentiments_are_binary(cls, v):
+        sentiments = np.asarray(v)
+        if sentiments.dtype.kind not in 'iu' or not np.isin(sentiments, SENTIMENTS).all():
+            raise ValueError('sentiments must be integers 0 or 1')
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def check_same_length(cls, values):
+        if len(values['review']) != len(values['sentiment']):
+            raise ValueError('review and sentiment must have the same length')
+        return values
+
+
+class ReviewsSource(BaseModel):
+    path: str = Field(
+        ...,
+        min_length=1,
+        description='local path of the reviews file, or gs://bucket/blob for a blob',
+    )
+    file_format: Optional[ReviewsFileFormatEnum] = Field(
+        default=None, description='inferred from the extension of the path if not set'
+    )
+    review_column: str = Field(default='review', description='column of the reviews')
+    sentiment_column: str = Field(default='sentiment', description='column of the sentiments')
+
+    @validator('path')
+    def check_path_is_allowed(cls, v):
+        # the training reads the file : callers must not reach any file of the node
+        if v.startswith('gs://'):
+            bucket_name = v[len('gs://'):].partition('/')[0]
+            if bucket_name not in SETTINGS.reviews_allowed_buckets:
+                raise ValueError(f'bucket not allowed for reviews files : {bucket_name}')
+            return v
+        data_root = os.path.realpath(SETTINGS.reviews_data_root)
+        if os.path.commonpath([data_root, os.path.realpath(v)]) != data_root:
+            raise ValueError(f'reviews files must be under {SETTINGS.reviews_data_root} : {v}')
+        if not os.path.isfile(v):
+            raise ValueError(f'reviews file not found : {v}')
+        return v
+
+    @validator('file_format', always=True)
+    def infer_file_format(cls, v, values):
+        if v is not None or 'path' not in values:
+            return v
+        extension = os.path.splitext(values['path'])[1].lstrip('.').lower()
+        try:
+            return ReviewsFileFormatEnum(extension)
+        except ValueError:
+            raise ValueError(
+                f'file_format cannot be inferred from the extension : {extension}'
+            )
+
+
+class TrainingConfig(BaseModel):
+    epochs: int = Field(default=3, ge=1, description='number of epochs of each training pass')
+    batch_size: int = Field(default=16, ge=1, description='number of reviews per forward pass')
+    learning_rate: float = Field(default=5e-5, gt=0, description='learning rate of AdamW')
+    max_length_percentile: float = Field(
+        default=99,
+        gt=0,
+        le=100,
+        description='reviews are truncated to this percentile of the token lengths '
+        'of the training set',
+    )
+    max_length: Optional[int] = Field(
+        default=None,
+        ge=2,
+        le=512,
+        description='upper bound of the number of tokens per review, '
+        'the 512 tokens bert accepts if not set',
+    )
+    gradient_accumulation_steps: int = Field(
+        default=1,
+        ge=1,
+        description='number of batches whose gradients are summed before each '
+        'optimizer step : the effective batch size is '
+        'batch_size * gradient_accumulation_steps',
+    )
+    retrain_on_full_data: bool = Field(
+        default=True,
+        description='once validated, train the model again on the training and '
+        'validation sets together, which doubles the training time',
+    )
+    checkpoint_interval_steps: int = Field(
+        default=500,
+        ge=0,
+        description='number of optimizer steps between two checkpoints, on top of '
+        'the checkpoint saved at the end of each epoch (0 : end of epochs only). '
+        'a training submitted again with the same inputs resumes from the last one',
+    )
+    early_stopping_patience: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description='validate after each epoch and stop once the validation '
+        'accuracy has not improved for this number of epochs (no early stopping '
+        'if not set). the model of the best epoch is kept, and the retrain on the '
+        'full dataset runs as many epochs as it took to reach it',
+    )
+    bf16_autocast: bool = Field(
+        default=False,
+        description='train and validate under bfloat16 autocast on CPU, the model is '
+        'then also validated in fp32 to report what the bfloat16 speedup costs',
+    )
+    data_parallel_processes: int = Field(
+        default=1,
+        ge=1,
+        description='number of local processes training on a shard of each epoch, '
+        'with their gradients synchronized at each optimizer step. the cores of the '
+        'node are split between them',
+    )
+    early_stopping_min_delta: float = Field(
+        default=0.0,
+        ge=0,
+        description='smallest increase of the validation accuracy counted as an improvement',
+    )
+    deduplicate_reviews: bool = Field(
+        default=False,
+        description='train on each normalized review (lowercased, whitespaces collapsed) '
+        'once, with its majority sentiment. reviews whose duplicates are tied on the '
+        'sentiment are dropped, the conflicting ones are reported',
+    )
+    duplicate_sample_weights: bool = Field(
+        default=False,
+        description='weight each deduplicated review in the loss by its number of '
+        'duplicates with the kept sentiment, as if they were all trained on',
+    )
+
+    @validator('duplicate_sample_weights')
+    def check_deduplicated_for_weights(cls, v, values):
+        if v and not values.get('deduplicate_reviews'):
+            raise ValueError('duplicate_sample_weights requires deduplicate_reviews')
+        return v
+
+
 class TrainingInput(BaseModel):
-    reviews_table: ReviewsTable = Field(...)
+    reviews_table: Optional[ReviewsTable] = Field(
+        default=None, description='reviews sent inline, one object per review'
+    )
+    reviews_columns: Optional[ReviewsColumns] = Field(
+        default=None,
+        description='reviews sent inline, one array per column : '
+        'much faster to validate than reviews_table for large uploads',
+    )
+    reviews_source: Optional[ReviewsSource] = Field(
+        default=None, description='file of reviews read in chunks by the training'
+    )
+    engine: EngineEnum = Field(
+        default=EngineEnum.bert,
+        description='bert : fine-tuned bert-base-uncased, '
+        'tfidf_logistic_regression : tf-idf features and a logistic regression, '
+        'trained in seconds and predicting in microseconds',
+    )
+    training_config: TrainingConfig = Field(default_factory=TrainingConfig)
+    quantize_model: bool = Field(
+        default=False,
+        description='also save a dynamic int8 quantized version of the model '
+        'and evaluate it on the validation set',
+    )
+    export_onnx: bool = Field(
+        default=False,
+        description='also export the model as an ONNX graph for the onnxruntime '
+        'inference backend (always done when the node serves with onnxruntime)',
+    )
+    fine_tune_saved_model: bool = Field(
+        default=False,
+        description='fine-tune the saved bert model on these reviews instead of '
+        'bert-base-uncased : only the new reviews need to be trained on',
+    )
+    replay_source: Optional[ReviewsSource] = Field(
+        default=None,
+        description='reviews of the previous trainings, a random sample of which is '
+        'mixed with the new ones so that the fine-tuning does not forget them',
+    )
+    replay_sample_size: int = Field(
+        default=10000, ge=1, description='number of reviews sampled from replay_source'
+    )
+
+    @root_validator(skip_on_failure=True)
+    def check_one_reviews_input(cls, values):
+        reviews_inputs = ['reviews_table', 'reviews_columns', 'reviews_source']
+        if sum(values.get(x) is not None for x in reviews_inputs) != 1:
+            raise ValueError(f'exactly one of {", ".join(reviews_inputs)} must be set')
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def check_fine_tuning_options(cls, values):
+        if values['fine_tune_saved_model'] and values['engine'] != EngineEnum.bert:
+            raise ValueError('only the bert engine can fine-tune the saved model')
+        if values['replay_source'] is not None and not values['fine_tune_saved_model']:
+            raise ValueError('replay_source requires fine_tune_saved_model')
+        return values
     
     
     def to_frame(
         self,
     ) -> pd.DataFrame:
+        if self.reviews_source is not None:
+            # imported here : reviews_io depends on these datamodels
+            from app.src.reviews_io import read_reviews_file
+
+            return read_reviews_file(self.reviews_source)
+        if self.reviews_columns is not None:
+            # the columns are handed to pandas as they are, no row is built
+            return pd.DataFrame(
+                {
+                    'review': self.reviews_columns.review,
+                    'sentiment': np.asarray(self.reviews_columns.sentiment),
+                }
+            )
         # Create series
         df_reviews = pd.DataFrame(
             data=[[x.review, x.sentiment] for x in self.reviews_table.data],
@@ -50,6 +294,58 @@ class TrainingInput(BaseModel):
 
 class TrainingOutput(BaseModel):
     accuracy_score: float = Field(description='Accuracy Score of the model')
+    epochs_trained: Optional[int] = Field(
+        default=None,
+        description='epochs trained before the validation, fewer than '
+        'training_config.epochs if the training stopped early : the epochs '
+        'up to the best validated one, whose model is kept',
+    )
+    quantized_accuracy_score: Optional[float] = Field(
+        default=None, description='Accuracy Score of the int8 quantized model'
+    )
+    quantized_accuracy_delta: Optional[float] = Field(
+        default=None,
+        description='quantized_accuracy_score - accuracy_score on the validation set',
+    )
+    bf16_accuracy_score: Optional[float] = Field(
+        default=None,
+        description='Accuracy Score of the model under bfloat16 autocast, '
+        'accuracy_score being the fp32 one',
+    )
+    bf16_accuracy_delta: Optional[float] = Field(
+        default=None,
+        description='bf16_accuracy_score - accuracy_score on the validation set',
+    )
+    base_accuracy_score: Optional[float] = Field(
+        default=None,
+        description='Accuracy Score of the saved model on the same validation set, '
+        'before it was fine-tuned',
+    )
+    duplicates_removed: Optional[int] = Field(
+        default=None, description='number of reviews removed by the deduplication'
+    )
+    label_conflicts: Optional[int] = Field(
+        default=None,
+        description='number of deduplicated reviews whose duplicates disagree on the sentiment',
+    )
+
+
+class TrainingJobOutput(BaseModel):
+    job_id: str = Field(..., description='id of the training job')
+    job_status: JobStatusEnum = Field(..., description='job_status')
+    progress: float = Field(default=0.0, description='progress of the training between 0 and 1')
+    progress_message: str = Field(default='', description='current step of the training')
+    training_output: Optional[TrainingOutput] = Field(
+        default=None, description='outputs of the training once completed'
+    )
+    error: Optional[str] = Field(default=None, description='error if the training failed')
+    timestamp_submitted: datetime.datetime = Field(...)
+    timestamp_start: Optional[datetime.datetime] = Field(default=None)
+    timestamp_end: Optional[datetime.datetime] = Field(default=None)
+    duration_in_seconds: Optional[float] = Field(
+        default=None, description='duration of the training once completed or failed'
+    )
+
     
 class ModelPredictInput(BaseModel):
     review: str = Field(..., min_length=1, description='Review to make a prediction.')
@@ -64,6 +360,37 @@ class ModelPredictOutput(BaseModel):
     sentiment: str = Field(..., description='sentiment of review')
 
 
+class ModelPredictBatchInput(BaseModel):
+    reviews: List[str] = Field(..., min_items=1, description='Reviews to make predictions.')
+
+    @validator('reviews', each_item=True)
+    def check_reviews_not_empty(cls, v):
+        if not v.strip():
+            raise ValueError('Reviews cannot be empty or whitespace.')
+        return v
+
+
+class ModelPredictBatchOutput(BaseModel):
+    predictions: List[ModelPredictOutput] = Field(
+        ..., description='predictions in the same order as the posted reviews'
+    )
+
+
+class ModelPredictStreamError(BaseModel):
+    line_number: int = Field(..., description='line of the request stream that could not be predicted')
+    error: str = Field(..., description='validation or prediction error of the line')
+
+
+class PredictionCacheStats(BaseModel):
+    size: int = Field(..., description='number of predictions currently cached')
+    max_size: int = Field(..., description='maximum number of cached predictions')
+    ttl_seconds: float = Field(..., description='time to live of a cached prediction')
+    hits: int = Field(..., description='number of lookups served from the cache')
+    misses: int = Field(..., description='number of lookups not found in the cache')
+    evictions: int = Field(..., description='number of predictions evicted by the LRU policy')
+    hit_rate: float = Field(..., description='hits / (hits + misses)')
+
+
 class DummyInputs(BaseModel):
     id: str
     dummy_parameter: DummyParameterEnum = Field(
@@ -0,0 +1,107 @@
+import datetime
+import logging
+import multiprocessing
+import os
+import socket
+from contextlib import contextmanager
+from typing import List
+
+import torch
+import torch.distributed as dist
+
+from app.src.config import SETTINGS
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+_MASTER_ADDRESS = "127.0.0.1"
+# a rank that dies leaves the others blocked in a collective until then
+_PROCESS_GROUP_TIMEOUT = datetime.timedelta(minutes=30)
+
+
+def get_rank() -> int:
+    return dist.get_rank() if dist.is_initialized() else 0
+
+
+def get_world_size() -> int:
+    return dist.get_world_size() if dist.is_initialized() else 1
+
+
+def is_main_process() -> bool:
+    return get_rank() == 0
+
+
+def barrier() -> None:
+    if dist.is_initialized():
+        dist.barrier()
+
+
+def all_gather_lists(values: list) -> list:
+    # concatenation of the lists of every rank, in rank order
+    if not dist.is_initialized():
+        return values
+    gathered: List[list] = [None] * dist.get_world_size()
+    dist.all_gather_object(gathered, values)
+    return [value for rank_values in gathered for value in rank_values]
+
+
+def find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((_MASTER_ADDRESS, 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def data_parallel_process_group(rank: int, world_size: int, port: int):
+    """
+    Notes :
+        joins the gloo process group of the local ranks. the cores of the node
+        are split between the ranks, each rank running its share of the batches
+        with its own intra-op threads
+    """
+    num_threads = torch.get_num_threads()
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    dist.init_process_group(
+        backend="gloo",
+        init_method=f"tcp://{_MASTER_ADDRESS}:{port}",
+        rank=rank,
+        world_size=world_size,
+        timeout=_PROCESS_GROUP_TIMEOUT,
+    )
+    logging.info(
+        f"rank {rank}/{world_size} joined the process group"
+        f" - torch threads : {torch.get_num_threads()}"
+    )
+    try:
+        yield
+    finally:
+        dist.destroy_process_group()
+        torch.set_num_threads(num_threads)
+
+
+def start_worker_processes(target, world_size: int, port: int, *args) -> list:
+    """
+    Notes :
+        starts the ranks 1 to world_size - 1 as spawned processes calling
+        target(rank, world_size, port, *args), the caller runs rank 0 itself
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for rank in range(1, world_size):
+        process = context.Process(
+            target=target,
+            args=(rank, world_size, port, *args),
+            name=f"training-rank-{rank}",
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def join_worker_processes(processes: list, terminate: bool = False) -> None:
+    for process in processes:
+        if terminate and process.is_alive():
+            process.terminate()
+        process.join()
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed and not terminate:
+        raise RuntimeError(f"data parallel training processes failed : {failed}")
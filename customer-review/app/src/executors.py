@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from app.src.config import SETTINGS
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+# forward passes never queue behind the requests starlette runs in its own
+# threadpool, trainings run in their own process (see training_jobs)
+INFERENCE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=SETTINGS.inference_workers, thread_name_prefix="inference"
+)
+
+
+def configure_torch_threads(
+    intra_op_threads: int = SETTINGS.torch_intra_op_threads,
+    inter_op_threads: int = SETTINGS.torch_inter_op_threads,
+) -> None:
+    """
+    Notes :
+        0 keeps the torch default (one intra-op thread per core). when several
+        inference workers run side by side, inference_workers * intra_op_threads
+        should not exceed the number of cores to avoid oversubscription.
+        torch is imported here only : the onnxruntime backend never loads it
+    """
+    import torch
+
+    if intra_op_threads > 0:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            # can only be set once, before any inter-op parallel work
+            logging.warning(f"torch inter-op threads not set : {e}")
+    logging.info(
+        f"torch threads - intra-op : {torch.get_num_threads()}"
+        f" - inter-op : {torch.get_num_interop_threads()}"
+    )
+
+
+async def run_in_executor(executor: Executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
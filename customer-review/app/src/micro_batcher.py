@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from app.src.config import SETTINGS
+from app.src.datamodels import (
+    ModelPredictBatchInput,
+    ModelPredictInput,
+    ModelPredictOutput,
+)
+from app.src.executors import INFERENCE_EXECUTOR, run_in_executor
+from app.src.model_predict import lookup_cached_sentiment, model_predict_batch
+from app.src.model_registry import MODEL_REGISTRY, ModelRegistry
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+_PendingPrediction = Tuple[ModelPredictInput, asyncio.Future]
+
+
+class MicroBatcher:
+    """
+    Notes :
+        collects the single review predictions posted concurrently during at most
+        max_wait_ms (or until max_batch_size reviews are waiting) and runs them as
+        one padded forward pass, then resolves each caller's future with its own
+        output. the worker task only lives while there are pending predictions,
+        it is (re)started by submit on the running event loop
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = SETTINGS.micro_batch_max_size,
+        max_wait_ms: float = SETTINGS.micro_batch_max_wait_ms,
+        model_registry: ModelRegistry = MODEL_REGISTRY,
+    ):
+        self.max_batch_size: int = max_batch_size
+        self.max_wait_seconds: float = max_wait_ms / 1000
+        self.model_registry: ModelRegistry = model_registry
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, inputs: ModelPredictInput) -> ModelPredictOutput:
+        # cached predictions do not need to wait for a batch
+        loaded_model = self.model_registry.peek()
+        if loaded_model is not None:
+            sentiment = lookup_cached_sentiment(inputs.review, loaded_model)
+            if sentiment is not None:
+                return ModelPredictOutput(sentiment=sentiment)
+
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((inputs, future))
+        return await future
+
+    async def _collect_batch(self) -> List[_PendingPrediction]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _predict(self, batch: List[ModelPredictInput]) -> List[ModelPredictOutput]:
+        # inputs have already been validated one by one
+        batch_inputs = ModelPredictBatchInput.construct(
+            reviews=[inputs.review for inputs in batch]
+        )
+        outputs = model_predict_batch(
+            inputs=batch_inputs, model_registry=self.model_registry
+        )
+        return outputs.predictions
+
+    async def _run(self) -> None:
+        while not self._queue.empty():
+            batch = await self._collect_batch()
+            batch = [(inputs, future) for inputs, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            logging.debug(f"running micro batch of size {len(batch)}")
+            try:
+                outputs = await run_in_executor(
+                    INFERENCE_EXECUTOR, self._predict, [inputs for inputs, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), output in zip(batch, outputs):
+                    if not future.done():
+                        future.set_result(output)
+
+    async def close(self) -> None:
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        self._worker = None
+
+
+MICRO_BATCHER = MicroBatcher()
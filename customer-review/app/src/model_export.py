@@ -0,0 +1,114 @@
+import logging
+import os
+
+from app.src.config import SETTINGS
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+ONNX_MODEL_FILE_NAME = "model.onnx"
+# the fast tokenizer serialized by save_pretrained, read without transformers
+ONNX_TOKENIZER_FILE_NAME = "tokenizer.json"
+_ONNX_OPSET_VERSION = 14
+_ONNX_INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+_ONNX_OUTPUT_NAMES = ["logits"]
+
+
+def get_onnx_model_file_path(model_path: str) -> str:
+    return os.path.join(model_path, ONNX_MODEL_FILE_NAME)
+
+
+def get_onnx_tokenizer_file_path(model_path: str) -> str:
+    return os.path.join(model_path, ONNX_TOKENIZER_FILE_NAME)
+
+
+def export_model_to_onnx(model_path: str) -> str:
+    """
+    Notes :
+        exports the fp32 model saved in model_path as an ONNX graph next to it,
+        with dynamic batch and sequence axes so that the graph accepts the
+        per bucket padded batches built at prediction time. the tokenizer
+        is serialized next to it when missing so that the onnxruntime backend
+        tokenizes without importing transformers and torch.
+        both files are written under a temporary name then renamed, the graph
+        last : a process loading the model never opens a half written file
+    """
+    # torch is only needed to export, not to serve the exported graph
+    import torch
+    from transformers import BertForSequenceClassification, BertTokenizerFast
+
+    onnx_file_path = get_onnx_model_file_path(model_path)
+    logging.info(f"exporting {model_path} to {onnx_file_path} - start")
+
+    model = BertForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    tokenizer = BertTokenizerFast.from_pretrained(model_path)
+    dummy_inputs = tokenizer(["dummy review"], return_tensors="pt")
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in _ONNX_INPUT_NAMES}
+    dynamic_axes.update({name: {0: "batch"} for name in _ONNX_OUTPUT_NAMES})
+
+    tokenizer_file_path = get_onnx_tokenizer_file_path(model_path)
+    tmp_suffix = f".tmp-{os.getpid()}"
+    try:
+        if not os.path.isfile(tokenizer_file_path):
+            tokenizer.backend_tokenizer.save(tokenizer_file_path + tmp_suffix)
+            os.replace(tokenizer_file_path + tmp_suffix, tokenizer_file_path)
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(dummy_inputs[name] for name in _ONNX_INPUT_NAMES),
+                onnx_file_path + tmp_suffix,
+                input_names=_ONNX_INPUT_NAMES,
+                output_names=_ONNX_OUTPUT_NAMES,
+                dynamic_axes=dynamic_axes,
+                opset_version=_ONNX_OPSET_VERSION,
+            )
+        os.replace(onnx_file_path + tmp_suffix, onnx_file_path)
+    except BaseException:
+        for file_path in (tokenizer_file_path, onnx_file_path):
+            if os.path.exists(file_path + tmp_suffix):
+                os.remove(file_path + tmp_suffix)
+        raise
+
+    logging.info(f"exporting {model_path} to {onnx_file_path} - end")
+    return onnx_file_path
+
+
+def load_onnx_session(
+    model_path: str,
+    intra_op_threads: int = SETTINGS.torch_intra_op_threads,
+    inter_op_threads: int = SETTINGS.torch_inter_op_threads,
+):
+    # onnxruntime is only needed by the onnxruntime inference backend
+    import onnxruntime
+
+    # same thread budget as the pytorch backend, 0 keeps the onnxruntime default
+    session_options = onnxruntime.SessionOptions()
+    session_options.intra_op_num_threads = intra_op_threads
+    session_options.inter_op_num_threads = inter_op_threads
+
+    return onnxruntime.InferenceSession(
+        get_onnx_model_file_path(model_path),
+        sess_options=session_options,
+        providers=["CPUExecutionProvider"],
+    )
+
+
+def load_onnx_tokenizer(model_path: str, max_length: int):
+    """
+    Returns :
+        the tokenizers.Tokenizer backing the saved BertTokenizerFast,
+        truncating to max_length and not padding, padding is done per bucket
+    """
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_file(get_onnx_tokenizer_file_path(model_path))
+    tokenizer.no_padding()
+    tokenizer.enable_truncation(max_length=max_length)
+    return tokenizer
+
+
+if __name__ == "__main__":
+    from app.src.model_registry import SAVED_MODEL_PATH
+
+    export_model_to_onnx(model_path=SAVED_MODEL_PATH)
@@ -0,0 +1,122 @@
+import datetime
+import logging
+import os
+import uuid
+
+import joblib
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from app.src.config import SETTINGS
+from app.src.datamodels import TrainingInput, TrainingOutput
+from app.src.model_registry import (
+    ENGINE_TFIDF_LOGISTIC_REGRESSION,
+    LINEAR_MODEL_FILE_NAME,
+    SAVED_MODEL_PATH,
+    install_saved_model,
+    write_model_metadata,
+)
+from app.src.preprocessing import normalize_review
+from app.src.reviews_io import load_training_reviews
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+
+def build_linear_pipeline() -> Pipeline:
+    """
+    Notes :
+        unigrams and bigrams of the normalized reviews, weighted by tf-idf with
+        a sublinear term frequency, and a logistic regression on these sparse
+        features. both are linear in the size of the corpus
+    """
+    return Pipeline(
+        [
+            (
+                "tfidf",
+                TfidfVectorizer(
+                    preprocessor=normalize_review,
+                    ngram_range=(1, 2),
+                    sublinear_tf=True,
+                ),
+            ),
+            (
+                "logistic_regression",
+                LogisticRegression(max_iter=1000, random_state=SETTINGS.training_seed),
+            ),
+        ]
+    )
+
+
+def _fit_linear_pipeline(df_reviews: pd.DataFrame, sample_weights: bool) -> Pipeline:
+    fit_params = (
+        {"logistic_regression__sample_weight": df_reviews["weight"].values}
+        if sample_weights
+        else {}
+    )
+    pipeline = build_linear_pipeline()
+    pipeline.fit(df_reviews["review"], df_reviews["sentiment"], **fit_params)
+    return pipeline
+
+
+def train_linear_model(
+    inputs: TrainingInput,
+    progress_callback=None,
+    model_path: str = SAVED_MODEL_PATH,
+) -> TrainingOutput:
+    """
+    Notes :
+        same split, validation, classification report and retrain on the full
+        dataset as the bert engine. epochs, batches and the other options of
+        the bert training do not apply
+    """
+    if inputs.quantize_model or inputs.export_onnx:
+        logging.warning("quantize_model and export_onnx are ignored by the linear model")
+    df_reviews, deduplication_report = load_training_reviews(inputs)
+    sample_weights = inputs.training_config.duplicate_sample_weights
+    train_df, val_df = train_test_split(
+        df_reviews,
+        test_size=0.2,
+        random_state=SETTINGS.training_seed,
+        stratify=df_reviews["sentiment"],
+    )
+
+    if progress_callback is not None:
+        progress_callback(0.0, "training")
+    pipeline = _fit_linear_pipeline(train_df, sample_weights)
+
+    if progress_callback is not None:
+        progress_callback(0.5, "validation")
+    predictions = pipeline.predict(val_df["review"])
+    output = TrainingOutput(accuracy_score=accuracy_score(val_df["sentiment"], predictions))
+    if deduplication_report is not None:
+        output.duplicates_removed = deduplication_report.duplicates_removed
+        output.label_conflicts = len(deduplication_report.conflicts)
+    clsf_report = pd.DataFrame(
+        classification_report(y_true=val_df["sentiment"], y_pred=predictions, output_dict=True)
+    ).transpose()
+    clsf_report.to_csv("app/data/classification_report.csv", index=True)
+
+    if inputs.training_config.retrain_on_full_data:
+        if progress_callback is not None:
+            progress_callback(0.5, "training on the full dataset")
+        pipeline = _fit_linear_pipeline(df_reviews, sample_weights)
+
+    if progress_callback is not None:
+        progress_callback(1.0, "saving the model")
+    # a new model_version invalidates the predictions cached for the previous model
+    metadata = {
+        "model_version": uuid.uuid4().hex,
+        "engine": ENGINE_TFIDF_LOGISTIC_REGRESSION,
+        "trained_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    tmp_model_path = f"{model_path}.tmp-{metadata['model_version']}"
+    os.makedirs(tmp_model_path)
+    joblib.dump(pipeline, os.path.join(tmp_model_path, LINEAR_MODEL_FILE_NAME))
+    write_model_metadata(tmp_model_path, metadata)
+    install_saved_model(tmp_model_path, model_path)
+
+    return output
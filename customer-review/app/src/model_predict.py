@@ -1,39 +1,192 @@
-from asyncio.subprocess import PIPE
-from app.src.datamodels import ModelPredictInput, ModelPredictOutput
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.src.config import SETTINGS
+from app.src.datamodels import (
+    ModelPredictBatchInput,
+    ModelPredictBatchOutput,
+    ModelPredictInput,
+    ModelPredictOutput,
+)
+from app.src.model_registry import (
+    ENGINE_TFIDF_LOGISTIC_REGRESSION,
+    MODEL_REGISTRY,
+    LoadedModel,
+    ModelRegistry,
+)
+from app.src.prediction_cache import PREDICTION_CACHE, PredictionCache
 from fastapi import HTTPException
-import torch
-from transformers import BertTokenizer, BertForSequenceClassification
-import pandas as pd
-import os
-        
+
+_NO_MODEL_SENTIMENT = 'First train the model'
+
+
+def _to_sentiment(prediction: int) -> str:
+    return 'positive' if prediction == 1 else 'negative'
+
+
+def _encode(reviews: List[str], loaded_model: LoadedModel) -> Dict[str, List[List[int]]]:
+    # truncated but not padded, padding is done per bucket
+    if loaded_model.backend == 'onnxruntime':
+        # a tokenizers.Tokenizer, truncating to max_length since its loading
+        encodings = loaded_model.tokenizer.encode_batch(reviews)
+        return {
+            'input_ids': [x.ids for x in encodings],
+            'token_type_ids': [x.type_ids for x in encodings],
+            'attention_mask': [x.attention_mask for x in encodings],
+        }
+    return dict(
+        loaded_model.tokenizer(reviews, truncation=True, max_length=loaded_model.max_length)
+    )
+
+
+def _pad(features: Dict[str, List[List[int]]], loaded_model: LoadedModel):
+    if loaded_model.backend == 'onnxruntime':
+        # onnxruntime works on numpy arrays, torch is not needed on its hot path.
+        # the bert [PAD] token, token type and attention mask are all 0
+        max_length = max(len(input_ids) for input_ids in features['input_ids'])
+        batch = {}
+        for key, values in features.items():
+            batch[key] = np.zeros((len(values), max_length), dtype=np.int64)
+            for row, value in enumerate(values):
+                batch[key][row, :len(value)] = value
+        return batch
+    return loaded_model.tokenizer.pad(features, padding=True, return_tensors='pt')
+
+
+def _predict_batch(loaded_model: LoadedModel, batch) -> List[int]:
+    if loaded_model.backend == 'onnxruntime':
+        session = loaded_model.model
+        input_names = [x.name for x in session.get_inputs()]
+        logits = session.run(['logits'], {name: batch[name] for name in input_names})[0]
+        return logits.argmax(axis=-1).tolist()
+
+    # only the pytorch backend imports torch
+    import torch
+
+    with torch.inference_mode(), torch.autocast(
+        'cpu', dtype=torch.bfloat16, enabled=loaded_model.bf16_autocast
+    ):
+        logits = loaded_model.model(**batch).logits
+    return torch.argmax(logits, dim=-1).tolist()
+
+
+def predict_sentiments(
+    reviews: List[str],
+    loaded_model: LoadedModel,
+    batch_size: int = SETTINGS.predict_batch_size,
+) -> List[str]:
+    """
+    Notes :
+        reviews are sorted by token length and cut into buckets of batch_size
+        so that each bucket is only padded to its own longest review.
+        sentiments are returned in the order of the reviews.
+        the tfidf_logistic_regression pipeline predicts all the reviews at once
+    """
+    if loaded_model.engine == ENGINE_TFIDF_LOGISTIC_REGRESSION:
+        return [_to_sentiment(prediction) for prediction in loaded_model.model.predict(reviews)]
+
+    # Tokenize without padding, padding is done per bucket
+    encodings = _encode(reviews, loaded_model)
+    lengths = [len(input_ids) for input_ids in encodings['input_ids']]
+    order = sorted(range(len(reviews)), key=lambda idx: lengths[idx])
+
+    predictions = [0] * len(reviews)
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        batch = _pad(
+            {key: [values[idx] for idx in bucket] for key, values in encodings.items()},
+            loaded_model,
+        )
+        for idx, prediction in zip(bucket, _predict_batch(loaded_model, batch)):
+            predictions[idx] = prediction
+
+    return [_to_sentiment(prediction) for prediction in predictions]
+
+
+def lookup_cached_sentiment(
+    review: str,
+    loaded_model: LoadedModel,
+    prediction_cache: PredictionCache = PREDICTION_CACHE,
+) -> Optional[str]:
+    # a miss is not recorded here since the review is then predicted
+    # through predict_sentiments_with_cache which records it
+    if not prediction_cache.enabled:
+        return None
+    return prediction_cache.get(
+        PredictionCache.make_key(review, loaded_model.model_version),
+        record_miss=False,
+    )
+
+
+def predict_sentiments_with_cache(
+    reviews: List[str],
+    loaded_model: LoadedModel,
+    prediction_cache: PredictionCache = PREDICTION_CACHE,
+) -> List[str]:
+    """
+    Notes :
+        only the reviews missing from the cache are sent to the model, each
+        distinct review once even if it is repeated within the reviews
+    """
+    if not prediction_cache.enabled:
+        return predict_sentiments(reviews, loaded_model)
+
+    keys = [PredictionCache.make_key(x, loaded_model.model_version) for x in reviews]
+    sentiments_by_key: Dict[str, Optional[str]] = {
+        key: prediction_cache.get(key) for key in dict.fromkeys(keys)
+    }
+
+    reviews_to_predict_by_key = {
+        key: review
+        for key, review in zip(keys, reviews)
+        if sentiments_by_key[key] is None
+    }
+    if reviews_to_predict_by_key:
+        sentiments = predict_sentiments(
+            list(reviews_to_predict_by_key.values()), loaded_model
+        )
+        for key, sentiment in zip(reviews_to_predict_by_key.keys(), sentiments):
+            prediction_cache.put(key, sentiment)
+            sentiments_by_key[key] = sentiment
+
+    return [sentiments_by_key[key] for key in keys]
+
+
 def model_predict(
-    inputs: ModelPredictInput
+    inputs: ModelPredictInput,
+    model_registry: ModelRegistry = MODEL_REGISTRY,
+):
+    try:
+        # the saved model is loaded on the first prediction
+        loaded_model = model_registry.get()
+        if loaded_model is not None:
+            sentiment = predict_sentiments_with_cache([inputs.review], loaded_model)[0]
+        else:
+            sentiment = _NO_MODEL_SENTIMENT
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
+
+    # Get the predictions
+    outputs = ModelPredictOutput(sentiment=sentiment)
+    return outputs
+
+
+def model_predict_batch(
+    inputs: ModelPredictBatchInput,
+    model_registry: ModelRegistry = MODEL_REGISTRY,
 ):
-    review = inputs.review
-    if os.path.isdir('app/models/saved_model'):
-        # Load the model and tokenizer
-        model = BertForSequenceClassification.from_pretrained('app/models/saved_model')
-        tokenizer = BertTokenizer.from_pretrained('app/models/saved_model')
-        model.eval()
-        try:    
-            # Tokenize the input review
-            inputs = tokenizer(review, return_tensors='pt', padding=True, truncation=True, max_length=512)
-            with torch.no_grad():
-                logits = model(**inputs).logits
-                prediction = torch.argmax(logits, dim=-1).item()
-        
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
-
-
-        sentiment = 'positive' if prediction == 1 else 'negative'
-            
-            
-        # Get the predictions
-        outputs = ModelPredictOutput(sentiment=sentiment)
-    
-    else:
-        # Get the predictions
-        outputs = ModelPredictOutput(sentiment='First train the model')
+    try:
+        # the saved model is loaded on the first prediction
+        loaded_model = model_registry.get()
+        if loaded_model is not None:
+            sentiments = predict_sentiments_with_cache(inputs.reviews, loaded_model)
+        else:
+            sentiments = [_NO_MODEL_SENTIMENT] * len(inputs.reviews)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
+
+    outputs = ModelPredictBatchOutput(
+        predictions=[ModelPredictOutput(sentiment=sentiment) for sentiment in sentiments]
+    )
     return outputs
-    
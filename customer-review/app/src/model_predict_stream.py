@@ -0,0 +1,138 @@
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.src.config import SETTINGS
+from app.src.datamodels import (
+    ModelPredictBatchInput,
+    ModelPredictInput,
+    ModelPredictStreamError,
+)
+from app.src.executors import INFERENCE_EXECUTOR, run_in_executor
+from app.src.model_predict import model_predict_batch
+from app.src.model_registry import MODEL_REGISTRY, ModelRegistry
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# an input line with its line number in the request stream
+_NumberedInput = Tuple[int, ModelPredictInput]
+
+
+class NdjsonStreamingResponse(StreamingResponse):
+    """
+    Notes :
+        the request body is read while the response is streamed. starlette's
+        StreamingResponse listens for the client disconnection on the same
+        receive channel, which would swallow the request body, so it is not
+        done here : a disconnection surfaces as ClientDisconnect when reading
+        the request stream
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+async def _iter_lines(
+    byte_chunks: AsyncIterator[bytes], max_line_bytes: int
+) -> AsyncIterator[Optional[bytes]]:
+    """
+    Notes :
+        yields None in place of a line longer than max_line_bytes. its bytes
+        are dropped as they come : a body without newline never holds more
+        than max_line_bytes plus one chunk in memory
+    """
+    remainder = b""
+    too_long = False
+    async for chunk in byte_chunks:
+        *lines, remainder = (remainder + chunk).split(b"\n")
+        for line in lines:
+            # only the first line may end the line being dropped
+            yield None if too_long or len(line) > max_line_bytes else line
+            too_long = False
+        if len(remainder) > max_line_bytes:
+            too_long, remainder = True, b""
+    if too_long or remainder:
+        yield None if too_long or len(remainder) > max_line_bytes else remainder
+
+
+def _error_line(line_number: int, error: str) -> bytes:
+    return ModelPredictStreamError(line_number=line_number, error=error).json().encode() + b"\n"
+
+
+async def _predict_lines(
+    batch: List[_NumberedInput], model_registry: ModelRegistry
+) -> bytes:
+    batch_inputs = ModelPredictBatchInput.construct(
+        reviews=[inputs.review for _, inputs in batch]
+    )
+    try:
+        outputs = await run_in_executor(
+            INFERENCE_EXECUTOR,
+            model_predict_batch,
+            inputs=batch_inputs,
+            model_registry=model_registry,
+        )
+    except Exception as e:
+        # the response has already started : the stream goes on with one
+        # error line per review of the batch
+        if isinstance(e, HTTPException):
+            error = str(e.detail)
+        else:
+            error = f"Error during prediction: {str(e)}"
+        return b"".join(_error_line(line_number, error) for line_number, _ in batch)
+    return b"".join(x.json().encode() + b"\n" for x in outputs.predictions)
+
+
+async def stream_predictions(
+    byte_chunks: AsyncIterator[bytes],
+    batch_size: int = SETTINGS.predict_stream_batch_size,
+    model_registry: ModelRegistry = MODEL_REGISTRY,
+    max_line_bytes: int = SETTINGS.predict_stream_max_line_bytes,
+) -> AsyncIterator[bytes]:
+    """
+    Notes :
+        reads one ModelPredictInput per line and writes back one line per non
+        empty input line, in the same order : a ModelPredictOutput, or a
+        ModelPredictStreamError for a line that is not a valid ModelPredictInput,
+        is longer than max_line_bytes or could not be predicted.
+        at most batch_size reviews are held in memory whatever the input size
+    """
+    batch: List[_NumberedInput] = []
+    line_number = 0
+
+    async for line in _iter_lines(byte_chunks, max_line_bytes):
+        line_number += 1
+        if line is not None and not line.strip():
+            continue
+
+        error = None
+        if line is None:
+            error = f"line longer than {max_line_bytes} bytes"
+        else:
+            try:
+                inputs = ModelPredictInput.parse_raw(line)
+            except ValidationError as e:
+                error = str(e)
+        if error is not None:
+            # the lines preceding the invalid one are answered first
+            if batch:
+                yield await _predict_lines(batch, model_registry)
+                batch = []
+            yield _error_line(line_number, error)
+            continue
+
+        batch.append((line_number, inputs))
+        if len(batch) >= batch_size:
+            yield await _predict_lines(batch, model_registry)
+            batch = []
+
+    if batch:
+        yield await _predict_lines(batch, model_registry)
@@ -0,0 +1,74 @@
+import logging
+import os
+
+import torch
+from transformers import BertConfig, BertForSequenceClassification
+
+from app.src.config import SETTINGS
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+QUANTIZED_MODEL_FILE_NAME = "quantized_model.pt"
+
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Notes :
+        dynamic int8 quantization of the Linear layers, weights are quantized
+        ahead of time and activations on the fly. the model is copied, the fp32
+        model passed is left untouched
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=False
+    )
+
+
+def get_quantized_model_file_path(model_path: str) -> str:
+    return os.path.join(model_path, QUANTIZED_MODEL_FILE_NAME)
+
+
+def save_quantized_model(model: BertForSequenceClassification, model_path: str) -> None:
+    """
+    Notes :
+        written under a temporary name then renamed : a process loading the
+        model never opens a half written file
+    """
+    quantized_model = quantize_model(model)
+    quantized_file_path = get_quantized_model_file_path(model_path)
+    tmp_file_path = quantized_file_path + f".tmp-{os.getpid()}"
+    try:
+        torch.save(quantized_model.state_dict(), tmp_file_path)
+        os.replace(tmp_file_path, quantized_file_path)
+    finally:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+    logging.info(f"quantized model saved in {model_path}")
+
+
+def quantize_saved_model(model_path: str) -> None:
+    """
+    Notes :
+        quantizes the fp32 model saved in model_path, trained without
+        quantize_model, so that QUANTIZED_INFERENCE can serve it
+    """
+    model = BertForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    save_quantized_model(model, model_path)
+
+
+def load_quantized_model(model_path: str) -> torch.nn.Module:
+    # the quantized modules have to exist before their state_dict can be loaded
+    config = BertConfig.from_pretrained(model_path)
+    model = BertForSequenceClassification(config)
+    model.eval()
+    quantized_model = quantize_model(model)
+    quantized_model.load_state_dict(
+        torch.load(get_quantized_model_file_path(model_path))
+    )
+    return quantized_model
+
+
+if __name__ == "__main__":
+    from app.src.model_registry import SAVED_MODEL_PATH
+
+    quantize_saved_model(model_path=SAVED_MODEL_PATH)
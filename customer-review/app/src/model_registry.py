@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, NamedTuple, Optional, Tuple
+
+import joblib
+
+from app.src.config import SETTINGS
+from app.src.model_export import (
+    get_onnx_model_file_path,
+    get_onnx_tokenizer_file_path,
+    load_onnx_session,
+    load_onnx_tokenizer,
+)
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+SAVED_MODEL_PATH = "app/models/saved_model"
+MODEL_METADATA_FILE_NAME = "training_metadata.json"
+MAX_SEQUENCE_LENGTH = 512
+ENGINE_BERT = "bert"
+ENGINE_TFIDF_LOGISTIC_REGRESSION = "tfidf_logistic_regression"
+LINEAR_MODEL_FILE_NAME = "tfidf_logistic_regression.joblib"
+
+
+class LoadedModel(NamedTuple):
+    # a torch module for the pytorch backend,
+    # an onnxruntime.InferenceSession for the onnxruntime backend,
+    # a scikit-learn pipeline for the tfidf_logistic_regression engine
+    model: Any
+    # a BertTokenizerFast for the pytorch backend, its tokenizers.Tokenizer
+    # for the onnxruntime backend, None for the tfidf_logistic_regression
+    # engine whose pipeline tokenizes
+    tokenizer: Any
+    model_version: str
+    backend: str = "pytorch"
+    # reviews are truncated to the max_length derived from the training corpus
+    max_length: int = MAX_SEQUENCE_LENGTH
+    engine: str = ENGINE_BERT
+    # the pytorch fp32 model predicts under bfloat16 autocast
+    bf16_autocast: bool = False
+
+
+def write_model_metadata(model_path: str, metadata: dict) -> None:
+    with open(os.path.join(model_path, MODEL_METADATA_FILE_NAME), "w") as f:
+        json.dump(metadata, f)
+
+
+def read_model_metadata(model_path: str) -> dict:
+    metadata_file_path = os.path.join(model_path, MODEL_METADATA_FILE_NAME)
+    if not os.path.isfile(metadata_file_path):
+        return {}
+    with open(metadata_file_path) as f:
+        return json.load(f)
+
+
+def install_saved_model(tmp_model_path: str, model_path: str = SAVED_MODEL_PATH) -> None:
+    """
+    Notes :
+        a training writes its model to a sibling directory which then replaces
+        the saved one : the api workers never load a half written model, nor
+        the files of a previous model
+    """
+    previous_model_path = f"{tmp_model_path}.previous"
+    if os.path.isdir(model_path):
+        os.rename(model_path, previous_model_path)
+    os.rename(tmp_model_path, model_path)
+    shutil.rmtree(previous_model_path, ignore_errors=True)
+
+
+def get_model_metadata_mtime(model_path: str) -> Optional[int]:
+    try:
+        return os.stat(os.path.join(model_path, MODEL_METADATA_FILE_NAME)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def define_model_version(model_path: str, metadata: dict) -> str:
+    if "model_version" in metadata:
+        return metadata["model_version"]
+    # models saved before the metadata existed are versioned by their weights
+    weights_mtime = max(
+        os.path.getmtime(os.path.join(model_path, file_name))
+        for file_name in os.listdir(model_path)
+    )
+    return f"mtime-{weights_mtime}"
+
+
+class ModelRegistry:
+    """
+    Notes :
+        keeps the saved model and its tokenizer resident in memory so that
+        predictions do not reload the weights from disk on every request.
+        model and tokenizer are swapped together under a lock so that a reload
+        (e.g. after a training) never exposes a half loaded pair.
+        a training saves its model from another process : at most every
+        refresh_interval_seconds, get checks whether the saved model has changed
+        and reloads it, so that every api worker of the node ends up serving it.
+        with follow_saved_model False, get neither loads nor reloads the model :
+        the pre-fork launcher of app.serve reloads it in the parent and
+        restarts its workers instead, so they keep sharing one copy
+    """
+
+    def __init__(
+        self,
+        model_path: str = SAVED_MODEL_PATH,
+        quantized: bool = SETTINGS.quantized_inference,
+        backend: str = SETTINGS.inference_backend,
+        bf16: bool = SETTINGS.bf16_inference,
+        refresh_interval_seconds: float = SETTINGS.model_refresh_interval_seconds,
+        follow_saved_model: bool = True,
+    ):
+        self.model_path: str = model_path
+        self.quantized: bool = quantized
+        self.backend: str = backend
+        self.bf16: bool = bf16
+        self.refresh_interval_seconds: float = refresh_interval_seconds
+        self.follow_saved_model: bool = follow_saved_model
+        self._loaded: Optional[LoadedModel] = None
+        self._loaded_metadata_mtime: Optional[int] = None
+        self._last_refresh_check: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def is_loaded(self) -> bool:
+        return self._loaded is not None
+
+    def _load_model(self) -> Tuple[Any, str, bool]:
+        """
+        Returns :
+            the model to serve, the suffix identifying it in the model_version
+            and whether it predicts under bfloat16 autocast
+        """
+        if self.backend == "onnxruntime":
+            if self.quantized or self.bf16:
+                logging.warning("quantized_inference and bf16_inference are ignored by onnxruntime")
+            # exported by the training or by app.src.model_export, never here :
+            # the serving processes would race on the files and import torch
+            missing_file_paths = [
+                file_path
+                for file_path in (
+                    get_onnx_model_file_path(self.model_path),
+                    get_onnx_tokenizer_file_path(self.model_path),
+                )
+                if not os.path.isfile(file_path)
+            ]
+            if missing_file_paths:
+                raise FileNotFoundError(
+                    f"{', '.join(missing_file_paths)} not found : export the saved model"
+                    f" with `python -m app.src.model_export` to serve it with onnxruntime"
+                )
+            return load_onnx_session(self.model_path), "-onnx", False
+
+        # torch is only imported by the pytorch backend
+        from transformers import BertForSequenceClassification
+
+        from app.src.model_quantization import (
+            get_quantized_model_file_path,
+            load_quantized_model,
+        )
+
+        if self.quantized and os.path.isfile(
+            get_quantized_model_file_path(self.model_path)
+        ):
+            if self.bf16:
+                logging.warning("bf16_inference is ignored by the quantized model")
+            model = load_quantized_model(self.model_path)
+            version_suffix, bf16_autocast = "-int8", False
+        else:
+            if self.quantized:
+                logging.warning(
+                    f"no quantized model found in {self.model_path}"
+                    f" - serving the fp32 model"
+                )
+            model = BertForSequenceClassification.from_pretrained(self.model_path)
+            # bfloat16 predictions may differ from the fp32 ones : not the same cache entries
+            version_suffix, bf16_autocast = ("-bf16", True) if self.bf16 else ("", False)
+        model.eval()
+        model.requires_grad_(False)
+        return model, version_suffix, bf16_autocast
+
+    def _load_tokenizer(self, max_length: int) -> Any:
+        if self.backend == "onnxruntime":
+            return load_onnx_tokenizer(self.model_path, max_length)
+
+        from transformers import BertTokenizerFast
+
+        return BertTokenizerFast.from_pretrained(self.model_path)
+
+    def load(self) -> bool:
+        with self._lock:
+            if not os.path.isdir(self.model_path):
+                logging.warning(f"no saved model found in {self.model_path}")
+                self._loaded = None
+                return False
+
+            logging.info(f"loading model from {self.model_path} - start")
+            self._loaded_metadata_mtime = get_model_metadata_mtime(self.model_path)
+            metadata = read_model_metadata(self.model_path)
+            engine = metadata.get("engine", ENGINE_BERT)
+            max_length = metadata.get("max_length", MAX_SEQUENCE_LENGTH)
+            if engine == ENGINE_TFIDF_LOGISTIC_REGRESSION:
+                # neither the backend nor the quantization apply to the linear model
+                model = joblib.load(os.path.join(self.model_path, LINEAR_MODEL_FILE_NAME))
+                version_suffix, backend, tokenizer = "", "sklearn", None
+                bf16_autocast = False
+            else:
+                model, version_suffix, bf16_autocast = self._load_model()
+                backend = self.backend
+                tokenizer = self._load_tokenizer(max_length)
+            self._loaded = LoadedModel(
+                model=model,
+                tokenizer=tokenizer,
+                model_version=define_model_version(self.model_path, metadata)
+                + version_suffix,
+                backend=backend,
+                max_length=max_length,
+                engine=engine,
+                bf16_autocast=bf16_autocast,
+            )
+            logging.info(f"loading model from {self.model_path} - end")
+            return True
+
+    def unload(self) -> None:
+        with self._lock:
+            self._loaded = None
+
+    def peek(self) -> Optional[LoadedModel]:
+        # never triggers a load, safe to call from the event loop
+        return self._loaded
+
+    def get(self) -> Optional[LoadedModel]:
+        """
+        Notes :
+            the model is loaded on first use if it has not been loaded at startup
+            (e.g. when the app runs without its lifespan events)
+        """
+        if self.follow_saved_model and (self._loaded is None or self._is_stale()):
+            self.load()
+        return self._loaded
+
+    def _is_stale(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_refresh_check < self.refresh_interval_seconds:
+            return False
+        self._last_refresh_check = now
+        metadata_mtime = get_model_metadata_mtime(self.model_path)
+        # None while a training swaps the model directories : keep serving
+        return (
+            metadata_mtime is not None
+            and metadata_mtime != self._loaded_metadata_mtime
+        )
+
+
+MODEL_REGISTRY = ModelRegistry()
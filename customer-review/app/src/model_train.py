@@ -1,120 +1,567 @@
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from transformers import BertTokenizer
+from transformers import BertTokenizerFast
 from transformers import BertForSequenceClassification, AdamW
 from sklearn.metrics import accuracy_score, classification_report
 
 from asyncio.subprocess import PIPE
-from app.src.datamodels import TrainingOutput, TrainingInput
+from app.src.config import SETTINGS
+from app.src.datamodels import EngineEnum, TrainingOutput, TrainingInput
+from app.src.distributed_training import (
+    all_gather_lists,
+    barrier,
+    data_parallel_process_group,
+    find_free_port,
+    get_rank,
+    get_world_size,
+    is_main_process,
+    join_worker_processes,
+    start_worker_processes,
+)
+from app.src.model_export import export_model_to_onnx
+from app.src.model_linear import train_linear_model
+from app.src.model_quantization import quantize_model, save_quantized_model
+from app.src.model_registry import (
+    ENGINE_BERT,
+    MAX_SEQUENCE_LENGTH,
+    SAVED_MODEL_PATH,
+    define_model_version,
+    install_saved_model,
+    read_model_metadata,
+    write_model_metadata,
+)
+from app.src.reviews_io import load_training_reviews
+from app.src.tokenization_cache import TOKENIZATION_CACHE
+from app.src.training_checkpoints import TrainingCheckpointer, make_run_key
 # from app.src.artifacts_management import ArtifactsManager
 
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import Dataset, DataLoader, Sampler
+import contextlib
+import os
+import datetime
+import uuid
 import pytz
 import numpy as np
 import math
+import itertools
 from sklearn import preprocessing, cluster
 
 
+_PRETRAINED_MODEL_NAME = 'bert-base-uncased'
+_MAX_LENGTH_PERCENTILE = 99
+_BATCH_SIZE = 16
+# number of batches whose reviews are sorted by length together
+_BUCKET_SIZE_IN_BATCHES = 50
+# training on the training split, before the validation, then on the full dataset
+_PHASE_TRAINING = 'training'
+_PHASE_FULL_DATA = 'full_data'
+
 
 class ReviewDataset(Dataset):
-    def __init__(self, encodings, labels):
-        self.encodings = encodings
+    """
+    Notes :
+        the token ids are stored in one contiguous tensor padded to max_length,
+        next to the lengths and labels tensors. the batch sampler hands whole
+        arrays of indices to __getitem__, which slices the batch out of these
+        tensors, padded to its own longest review only, without any per review
+        allocation. the training and validation splits are index arrays into
+        the same dataset. input_ids may be memory-mapped from the tokenization
+        cache. with sample weights, the batches also hold the weights of their
+        reviews
+    """
+
+    def __init__(self, input_ids, lengths, labels, weights=None):
+        self.input_ids = input_ids
+        self.lengths = lengths
         self.labels = labels
+        self.weights = weights
 
-    def __getitem__(self, idx):
-        item = {key: torch.tensor(val[idx]) for key, val in self.encodings.items()}
-        item['labels'] = torch.tensor(self.labels[idx])
-        return item
+    def __getitem__(self, indices):
+        indices = torch.as_tensor(indices)
+        lengths = self.lengths[indices]
+        batch_length = int(lengths.max())
+        batch = {
+            'input_ids': self.input_ids[indices, :batch_length],
+            'attention_mask': (torch.arange(batch_length) < lengths[:, None]).long(),
+            'labels': self.labels[indices],
+        }
+        if self.weights is not None:
+            batch['weights'] = self.weights[indices]
+        return batch
 
     def __len__(self):
         return len(self.labels)
-    
 
-def model_train(
-    inputs: TrainingInput
-):
-    # Initialise the parameters
-    df_reviews = inputs.to_frame()
-    
-    # Split the dataset into training and validation sets
-    train_df, val_df = train_test_split(df_reviews, test_size=0.2, random_state=101, stratify=df_reviews['sentiment'])
 
-    # Initialize the tokenizer
-    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-    
-    
-    # Tokenize the training and validation reviews
-    train_encodings = tokenizer(train_df['review'].tolist(), padding=True, truncation=True, return_tensors='pt', max_length=512)
-    val_encodings = tokenizer(val_df['review'].tolist(), padding=True, truncation=True, return_tensors='pt', max_length=512)
-    
-    train_labels = train_df['sentiment'].values
-    val_labels = val_df['sentiment'].values
-    
-    
-    # Create datasets
-    train_dataset = ReviewDataset(train_encodings, train_labels)
-    val_dataset = ReviewDataset(val_encodings, val_labels)
+class LengthBucketBatchSampler(Sampler):
+    """
+    Notes :
+        groups reviews of similar lengths in the same batch. when shuffling, the
+        reviews are shuffled, cut into buckets of bucket_size_in_batches batches,
+        sorted by length within each bucket, and the batches are shuffled.
+        only the reviews at indices are sampled (all of them by default).
+        with num_replicas > 1, every replica draws the same batches from the
+        same seed and keeps one in num_replicas of them. when shuffling (i.e.
+        training) the first batches are repeated so that every replica runs
+        as many steps, its gradients being synchronized at each of them
+    """
 
+    def __init__(
+        self,
+        lengths,
+        batch_size=_BATCH_SIZE,
+        shuffle=True,
+        bucket_size_in_batches=_BUCKET_SIZE_IN_BATCHES,
+        seed=SETTINGS.training_seed,
+        indices=None,
+        num_replicas=1,
+        rank=0,
+    ):
+        self.indices = np.arange(len(lengths)) if indices is None else np.asarray(indices)
+        self.lengths = np.asarray(lengths)[self.indices]
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_size = batch_size * bucket_size_in_batches
+        self.generator = np.random.default_rng(seed)
+        self.num_replicas = num_replicas
+        self.rank = rank
 
-    # Create DataLoaders
-    train_loader = DataLoader(train_dataset, batch_size=16, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=16, shuffle=False)
-    
-    # Load the BERT model for sequence classification
-    model = BertForSequenceClassification.from_pretrained('bert-base-uncased', num_labels=2)
-    optimizer = AdamW(model.parameters(), lr=5e-5)
-    
-    # Train the model
-    model.train()
-    for epoch in range(3):  # Adjust epochs as necessary
-        for batch in train_loader:
-            optimizer.zero_grad()
-            outputs = model(**batch)
-            loss = outputs.loss
-            loss.backward()
-            optimizer.step()
-            
-    # Validate the model
+    def __iter__(self):
+        if not self.shuffle:
+            order = np.argsort(self.lengths, kind='stable')
+            batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        else:
+            indices = self.generator.permutation(len(self.lengths))
+            batches = []
+            for start in range(0, len(indices), self.bucket_size):
+                bucket = indices[start:start + self.bucket_size]
+                bucket = bucket[np.argsort(self.lengths[bucket], kind='stable')]
+                batches.extend(bucket[i:i + self.batch_size] for i in range(0, len(bucket), self.batch_size))
+            batches = [batches[i] for i in self.generator.permutation(len(batches))]
+
+        if self.num_replicas > 1:
+            if self.shuffle:
+                padding = -len(batches) % self.num_replicas
+                batches += [batches[i % len(batches)] for i in range(padding)]
+            batches = batches[self.rank::self.num_replicas]
+
+        for batch in batches:
+            yield self.indices[batch]
+
+    def __len__(self):
+        num_batches = math.ceil(len(self.lengths) / self.batch_size)
+        if self.shuffle:
+            return math.ceil(num_batches / self.num_replicas)
+        return len(range(self.rank, num_batches, self.num_replicas))
+
+
+def _create_data_loader(dataset, indices, shuffle, batch_size=_BATCH_SIZE):
+    # batch_size=None : each index array of the sampler is a whole batch.
+    # the loader draws its base seed from its own generator : the torch random
+    # state restored from a checkpoint is left to the dropout
+    return DataLoader(
+        dataset,
+        sampler=LengthBucketBatchSampler(
+            dataset.lengths.numpy(), batch_size=batch_size, shuffle=shuffle, indices=indices,
+            num_replicas=get_world_size(), rank=get_rank(),
+        ),
+        batch_size=None,
+        generator=torch.Generator().manual_seed(SETTINGS.training_seed),
+    )
+
+
+def _tokenize(tokenizer, reviews):
+    # unpadded, up to the 512 tokens bert accepts
+    encodings = tokenizer(
+        reviews,
+        truncation=True,
+        max_length=MAX_SEQUENCE_LENGTH,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )
+    return encodings['input_ids']
+
+
+def _pad_token_ids(token_ids, lengths, max_length, pad_token_id, sep_token_id):
+    """
+    Notes :
+        token_ids are the unpadded outputs of _tokenize. a review longer than
+        max_length is cut and ends with [SEP], as the tokenizer would have
+        truncated it
+    """
+    input_ids = np.full((len(token_ids), max_length), pad_token_id, dtype=np.int64)
+    for row, ids in enumerate(token_ids):
+        input_ids[row, :min(lengths[row], max_length)] = ids[:max_length]
+    input_ids[lengths > max_length, max_length - 1] = sep_token_id
+    return input_ids
+
+
+def _build_dataset(tokenizer, df_reviews, train_indices, training_config, cache=TOKENIZATION_CACHE):
+    """
+    Notes :
+        every review is tokenized at most once, and not at all when the same
+        reviews were tokenized by the same tokenizer in a previous training :
+        the token lengths and the padded token ids are then mapped from the
+        tokenization cache. max_length only depends on the training split and
+        on the training config
+    """
+    reviews = df_reviews['review'].tolist()
+    key = cache.make_key(reviews, tokenizer, MAX_SEQUENCE_LENGTH)
+    token_ids = None
+
+    lengths = cache.load(key, 'lengths')
+    if lengths is None:
+        token_ids = _tokenize(tokenizer, reviews)
+        lengths = np.fromiter((len(ids) for ids in token_ids), dtype=np.int64, count=len(token_ids))
+        cache.save(key, 'lengths', lengths)
+    max_length = _define_max_length(
+        lengths[train_indices],
+        percentile=training_config.max_length_percentile,
+        max_length_cap=training_config.max_length or MAX_SEQUENCE_LENGTH,
+    )
+
+    input_ids_name = f'input_ids_{max_length}'
+    input_ids = cache.load(key, input_ids_name)
+    if input_ids is None:
+        if token_ids is None:
+            token_ids = _tokenize(tokenizer, reviews)
+        input_ids = _pad_token_ids(token_ids, lengths, max_length, tokenizer.pad_token_id, tokenizer.sep_token_id)
+        del token_ids
+        cache.save(key, input_ids_name, input_ids)
+        if cache.enabled:
+            # train on the mapped copy, the padded array can be freed
+            input_ids = cache.load(key, input_ids_name)
+
+    dataset = ReviewDataset(
+        input_ids=torch.from_numpy(input_ids),
+        lengths=torch.from_numpy(np.minimum(lengths, max_length)),
+        labels=torch.as_tensor(df_reviews['sentiment'].values, dtype=torch.long),
+        weights=torch.as_tensor(df_reviews['weight'].values, dtype=torch.float) if training_config.duplicate_sample_weights else None,
+    )
+    return dataset, max_length
+
+
+def _define_max_length(lengths, percentile=_MAX_LENGTH_PERCENTILE, max_length_cap=MAX_SEQUENCE_LENGTH):
+    """
+    Notes :
+        most reviews are far shorter than the 512 tokens bert accepts, the
+        sequences are truncated to a percentile of the corpus token lengths
+    """
+    max_length = math.ceil(np.percentile(lengths, percentile))
+    return int(min(max_length, max_length_cap))
+
+
+def _compute_loss(outputs, labels, weights):
+    # mean of the losses of the batch, weighted by the number of duplicates of each review
+    if weights is None:
+        return outputs.loss
+    losses = torch.nn.functional.cross_entropy(outputs.logits.float(), labels, reduction='none')
+    return (losses * weights).sum() / weights.sum()
+
+
+def _new_phase_state(phase, epochs):
+    return {'phase': phase, 'epochs': epochs, 'epoch': 0, 'step': 0, 'sampler_state': None}
+
+
+def _train_epochs(model, optimizer, data_loader, training_config, checkpointer, training_state, on_epoch_start, on_epoch_end=None):
+    """
+    Notes :
+        the gradients of gradient_accumulation_steps batches are summed before
+        each optimizer step, the loss is scaled so that the step matches the
+        mean loss over the accumulated batches.
+        training_state tells where the phase stands and is saved with each
+        checkpoint : a resumed epoch replays the sampler from its state at the
+        start of the epoch and skips the batches already trained on.
+        on_epoch_end(epoch) returns False to stop the phase early.
+        a DistributedDataParallel model only synchronizes the gradients on the
+        batches followed by an optimizer step
+    """
+    module = model.module if isinstance(model, DistributedDataParallel) else model
+    generator = data_loader.sampler.generator
+    accumulation_steps = training_config.gradient_accumulation_steps
+    while training_state['epoch'] < training_state['epochs']:
+        epoch, start_step = training_state['epoch'], training_state['step']
+        if training_state['sampler_state'] is not None:
+            generator.bit_generator.state = training_state['sampler_state']
+        training_state['sampler_state'] = generator.bit_generator.state
+        on_epoch_start(epoch)
+
+        model.train()
+        optimizer.zero_grad()
+        for step, batch in enumerate(itertools.islice(data_loader, start_step, None), start=start_step + 1):
+            optimizer_step = step % accumulation_steps == 0 or step == len(data_loader)
+            no_sync = model.no_sync() if module is not model and not optimizer_step else contextlib.nullcontext()
+            weights = batch.pop('weights', None)
+            with no_sync:
+                with torch.autocast('cpu', dtype=torch.bfloat16, enabled=training_config.bf16_autocast):
+                    outputs = model(**batch)
+                loss = _compute_loss(outputs, batch['labels'], weights) / accumulation_steps
+                loss.backward()
+            if optimizer_step:
+                optimizer.step()
+                optimizer.zero_grad()
+                training_state['step'] = step
+                if step < len(data_loader) and checkpointer.is_due(step // accumulation_steps):
+                    checkpointer.save(module, optimizer, training_state)
+
+        training_state.update(epoch=epoch + 1, step=0, sampler_state=generator.bit_generator.state)
+        if on_epoch_end is not None and not on_epoch_end(epoch):
+            training_state['epochs'] = epoch + 1
+        # the end of a phase is checkpointed by the caller
+        if training_state['epoch'] < training_state['epochs']:
+            checkpointer.save(module, optimizer, training_state)
+
+
+def _evaluate(model, data_loader, bf16_autocast=False):
+    # in a data parallel training, every rank gets the predictions of all ranks
     model.eval()
     predictions, true_labels = [], []
-    for batch in val_loader:
-        with torch.no_grad():
+    for batch in data_loader:
+        # the validation accuracy counts every review once
+        batch.pop('weights', None)
+        with torch.no_grad(), torch.autocast('cpu', dtype=torch.bfloat16, enabled=bf16_autocast):
             outputs = model(**batch)
             logits = outputs.logits
             predictions.extend(torch.argmax(logits, dim=-1).tolist())
             true_labels.extend(batch['labels'].tolist())
+    return all_gather_lists(predictions), all_gather_lists(true_labels)
+
+
+def _report_progress(progress_callback, progress, message):
+    if progress_callback is not None:
+        progress_callback(progress, message)
+
+
+def _save_model(model, tokenizer, inputs, metadata, model_path=SAVED_MODEL_PATH):
+    tmp_model_path = f"{model_path}.tmp-{metadata['model_version']}"
+    model.save_pretrained(tmp_model_path)
+    tokenizer.save_pretrained(tmp_model_path)
+    if inputs.quantize_model:
+        save_quantized_model(model, tmp_model_path)
+    # the onnxruntime backend never exports the model it serves
+    if inputs.export_onnx or SETTINGS.inference_backend == 'onnxruntime':
+        export_model_to_onnx(tmp_model_path)
+    write_model_metadata(tmp_model_path, metadata)
+    install_saved_model(tmp_model_path, model_path)
+
+
+def _get_base_model(inputs, model_path=SAVED_MODEL_PATH):
+    """
+    Returns :
+        the path of the model to train from, and its model_version when the
+        saved model is fine-tuned
+    """
+    if not inputs.fine_tune_saved_model:
+        return _PRETRAINED_MODEL_NAME, None
+    if not os.path.isdir(model_path):
+        raise FileNotFoundError(f"no saved model to fine-tune in {model_path}")
+    metadata = read_model_metadata(model_path)
+    if metadata.get("engine", ENGINE_BERT) != ENGINE_BERT:
+        raise ValueError(f"the saved model is not a bert model : {metadata['engine']}")
+    return model_path, define_model_version(model_path, metadata)
+
+
+def _train_data_parallel_rank(rank, world_size, port, inputs):
+    with data_parallel_process_group(rank, world_size, port):
+        _train(inputs)
+
+
+def model_train(
+    inputs: TrainingInput,
+    progress_callback=None,
+):
+    """
+    Notes :
+        progress_callback(progress, message) is called with the share of the
+        training done so far, between 0 and 1, before each step.
+        with training_config.data_parallel_processes > 1, the calling process
+        trains as rank 0 of a gloo process group, next to the other ranks
+        spawned on the same node. rank 0 reports the progress, writes the
+        classification report, the checkpoints and the model.
+        the tfidf_logistic_regression engine trains in the calling process.
+        with fine_tune_saved_model, the training starts from the saved model
+        (tokenizer and weights) instead of bert-base-uncased, which is first
+        validated on the same validation set for comparison
+    """
+    if inputs.engine == EngineEnum.tfidf_logistic_regression:
+        return train_linear_model(inputs, progress_callback)
+
+    world_size = inputs.training_config.data_parallel_processes
+    if world_size == 1:
+        return _train(inputs, progress_callback)
+
+    port = find_free_port()
+    processes = start_worker_processes(_train_data_parallel_rank, world_size, port, inputs)
+    try:
+        with data_parallel_process_group(0, world_size, port):
+            output = _train(inputs, progress_callback)
+    except BaseException:
+        join_worker_processes(processes, terminate=True)
+        raise
+    join_worker_processes(processes)
+    return output
+
+
+def _train(
+    inputs: TrainingInput,
+    progress_callback=None,
+):
+    # Initialise the parameters
+    df_reviews, deduplication_report = load_training_reviews(inputs, write_report=is_main_process())
+    training_config = inputs.training_config
+    epochs = training_config.epochs
+    training_passes = 2 if training_config.retrain_on_full_data else 1
     
+    # Split the dataset into training and validation sets, as indices into the reviews
+    train_indices, val_indices = train_test_split(np.arange(len(df_reviews)), test_size=0.2, random_state=SETTINGS.training_seed, stratify=df_reviews['sentiment'])
+
+    # Train from bert-base-uncased, or fine-tune the saved model
+    base_model_path, base_model_version = _get_base_model(inputs)
+
+    # Initialize the tokenizer
+    tokenizer = BertTokenizerFast.from_pretrained(base_model_path)
+
+    # Tokenize every review once (or map the cached encodings), the training, validation and full dataset phases share them
+    # the other ranks map the encodings cached by rank 0
+    if not is_main_process():
+        barrier()
+    dataset, max_length = _build_dataset(tokenizer, df_reviews, train_indices, training_config)
+    if is_main_process():
+        barrier()
+
+    # Create DataLoaders batching reviews of similar lengths together
+    train_loader = _create_data_loader(dataset, train_indices, shuffle=True, batch_size=training_config.batch_size)
+    val_loader = _create_data_loader(dataset, val_indices, shuffle=False, batch_size=training_config.batch_size)
     
-    output = TrainingOutput(accuracy_score=accuracy_score(true_labels, predictions))
-    
-    
-    clsf_report = pd.DataFrame(classification_report(y_true = true_labels, y_pred = predictions, output_dict=True)).transpose()
-    clsf_report.to_csv('app/data/classification_report.csv', index= True)
-    
-    # Combine the training and validation sets
-    full_df = pd.concat([train_df, val_df])
-
-    # Tokenize the full dataset
-    full_encodings = tokenizer(full_df['review'].tolist(), padding=True, truncation=True, return_tensors='pt', max_length=512)
-    full_labels = full_df['sentiment'].values
-
-    # Create a new dataset for the full data
-    full_dataset = ReviewDataset(full_encodings, full_labels)
-    full_loader = DataLoader(full_dataset, batch_size=16, shuffle=True)
-
-    # Retrain the model on the full dataset
-    model.train()
-    for epoch in range(3):  # Choose the number of epochs based on your needs
-        for batch in full_loader:
-            optimizer.zero_grad()
-            outputs = model(**batch)
-            loss = outputs.loss
-            loss.backward()
-            optimizer.step()
-    
+    # Load the BERT model for sequence classification
+    model = BertForSequenceClassification.from_pretrained(base_model_path, num_labels=2)
+    optimizer = AdamW(model.parameters(), lr=training_config.learning_rate)
+
+    # Resume from the checkpoint of a previous run on the same inputs, if any
+    checkpointer = TrainingCheckpointer(
+        make_run_key(
+            df_reviews['review'].tolist(),
+            df_reviews['sentiment'].tolist(),
+            training_config,
+            weights=df_reviews['weight'].tolist() if training_config.duplicate_sample_weights else None,
+            base_model_version=base_model_version,
+        ),
+        training_config.checkpoint_interval_steps,
+        writer=is_main_process(),
+    )
+    training_state = checkpointer.load(model, optimizer)
+    if training_state is None:
+        training_state = {
+            **_new_phase_state(_PHASE_TRAINING, epochs),
+            'best_accuracy': None,
+            'best_epochs': 0,
+            'best_validation': None,
+            'epochs_without_improvement': 0,
+            'training_output': None,
+            'base_accuracy': None,
+        }
+        if base_model_version is not None:
+            # Validate the saved model before fine-tuning it
+            _report_progress(progress_callback, 0.0, "validation of the saved model")
+            base_predictions, base_true_labels = _evaluate(model, val_loader)
+            training_state['base_accuracy'] = accuracy_score(base_true_labels, base_predictions)
+    # every rank has loaded the checkpoint before rank 0 may replace it
+    barrier()
+    training_model = DistributedDataParallel(model) if get_world_size() > 1 else model
+
+    def _validate_epoch(epoch):
+        # early stopping on the accuracy of the validation set, the best epoch is kept
+        _report_progress(progress_callback, (epoch + 1) / (training_passes * epochs), f"validation epoch {epoch + 1}/{epochs}")
+        validation = _evaluate(model, val_loader, training_config.bf16_autocast)
+        accuracy = accuracy_score(validation[1], validation[0])
+        if training_state['best_accuracy'] is None or accuracy > training_state['best_accuracy'] + training_config.early_stopping_min_delta:
+            training_state.update(best_accuracy=accuracy, best_epochs=epoch + 1, best_validation=validation, epochs_without_improvement=0)
+            checkpointer.save_best(model, optimizer)
+        else:
+            training_state['epochs_without_improvement'] += 1
+        return training_state['epochs_without_improvement'] < training_config.early_stopping_patience
+
+    if training_state['phase'] == _PHASE_TRAINING:
+        # Train the model
+        _train_epochs(
+            training_model, optimizer, train_loader, training_config, checkpointer, training_state,
+            lambda epoch: _report_progress(progress_callback, epoch / (training_passes * epochs), f"training epoch {epoch + 1}/{epochs}"),
+            _validate_epoch if training_config.early_stopping_patience else None,
+        )
+
+        if training_config.early_stopping_patience:
+            if training_state['best_epochs'] < training_state['epochs']:
+                # back to the best epoch, the epochs after it did not improve on it
+                barrier()
+                checkpointer.load_best(model, optimizer)
+            training_state['epochs'] = training_state['best_epochs']
+
+        # Validate the model, the best epoch was validated already
+        _report_progress(progress_callback, 1 / training_passes, "validation")
+        predictions, true_labels = training_state['best_validation'] or _evaluate(model, val_loader, training_config.bf16_autocast)
+
+        if training_config.bf16_autocast:
+            # accuracy_score stays the fp32 one, next to the bfloat16 one
+            bf16_predictions = predictions
+            predictions, true_labels = _evaluate(model, val_loader)
+
+        output = TrainingOutput(
+            accuracy_score=accuracy_score(true_labels, predictions),
+            epochs_trained=training_state['epochs'],
+            base_accuracy_score=training_state.get('base_accuracy'),
+        )
+
+        if deduplication_report is not None:
+            output.duplicates_removed = deduplication_report.duplicates_removed
+            output.label_conflicts = len(deduplication_report.conflicts)
+
+        if training_config.bf16_autocast:
+            output.bf16_accuracy_score = accuracy_score(true_labels, bf16_predictions)
+            output.bf16_accuracy_delta = output.bf16_accuracy_score - output.accuracy_score
+
+        if inputs.quantize_model:
+            # Validate the int8 quantized model to know what the speedup costs
+            quantized_predictions, _ = _evaluate(quantize_model(model), val_loader)
+            output.quantized_accuracy_score = accuracy_score(true_labels, quantized_predictions)
+            output.quantized_accuracy_delta = output.quantized_accuracy_score - output.accuracy_score
+
+        if is_main_process():
+            clsf_report = pd.DataFrame(classification_report(y_true = true_labels, y_pred = predictions, output_dict=True)).transpose()
+            clsf_report.to_csv('app/data/classification_report.csv', index= True)
+
+        # the retrain on the full dataset runs as many epochs as the validated training
+        training_state.update(_new_phase_state(_PHASE_FULL_DATA, training_state['epochs']), training_output=output.dict())
+        checkpointer.save(model, optimizer, training_state)
+
+    output = TrainingOutput(**training_state['training_output'])
+
+    if training_config.retrain_on_full_data:
+        # Combine the training and validation sets, without tokenizing them again
+        full_loader = _create_data_loader(dataset, np.concatenate([train_indices, val_indices]), shuffle=True, batch_size=training_config.batch_size)
+
+        # Retrain the model on the full dataset
+        _train_epochs(
+            training_model, optimizer, full_loader, training_config, checkpointer, training_state,
+            lambda epoch: _report_progress(progress_callback, 0.5 + epoch / (2 * training_state['epochs']), f"training on the full dataset epoch {epoch + 1}/{training_state['epochs']}"),
+        )
+
+    if not is_main_process():
+        return None
+
     # Save the model
-    model.save_pretrained('app/models/saved_model')
-    tokenizer.save_pretrained('app/models/saved_model')
+    _report_progress(progress_callback, 1.0, "saving the model")
+    # a new model_version invalidates the predictions cached for the previous model
+    metadata = {
+        "model_version": uuid.uuid4().hex,
+        "engine": ENGINE_BERT,
+        "max_length": max_length,
+        "training_config": training_config.dict(),
+        "base_model_version": base_model_version,
+        "trained_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    _save_model(model, tokenizer, inputs, metadata)
+    checkpointer.clear()
 
     return output
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.src.config import SETTINGS
+from app.src.datamodels import PredictionCacheStats
+from app.src.preprocessing import hash_review
+
+
+class PredictionCache:
+    """
+    Notes :
+        in process LRU cache of predicted sentiments. entries are keyed on the hash
+        of the normalized review and on the version of the model that predicted
+        them, so that a newly trained model never serves stale predictions.
+        entries older than ttl_seconds are dropped on access (no expiry if <= 0),
+        the least recently used entry is evicted once max_size is reached
+        (cache disabled if max_size <= 0)
+    """
+
+    def __init__(
+        self,
+        max_size: int = SETTINGS.prediction_cache_size,
+        ttl_seconds: float = SETTINGS.prediction_cache_ttl_seconds,
+    ):
+        self.max_size: int = max_size
+        self.ttl_seconds: float = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def make_key(review: str, model_version: str) -> str:
+        return f"{model_version}:{hash_review(review)}"
+
+    def _is_expired(self, inserted_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - inserted_at > self.ttl_seconds
+
+    def get(self, key: str, record_miss: bool = True) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry[0]):
+                if entry is not None:
+                    del self._entries[key]
+                if record_miss:
+                    self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, sentiment: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), sentiment)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> PredictionCacheStats:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return PredictionCacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                ttl_seconds=self.ttl_seconds,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                hit_rate=self.hits / lookups if lookups else 0.0,
+            )
+
+
+PREDICTION_CACHE = PredictionCache()
@@ -0,0 +1,68 @@
+import hashlib
+import re
+from typing import NamedTuple, Tuple
+
+import pandas as pd
+
+_WHITESPACES_PATTERN = re.compile(r"\s+")
+
+
+def normalize_review(review: str) -> str:
+    """
+    Notes :
+        the model tokenizer is uncased and splits on whitespaces, so lowercasing
+        and collapsing whitespaces does not change what the model sees
+    """
+    return _WHITESPACES_PATTERN.sub(" ", review).strip().lower()
+
+
+def hash_review(review: str) -> str:
+    return hashlib.sha256(normalize_review(review).encode("utf-8")).hexdigest()
+
+
+class DeduplicationReport(NamedTuple):
+    duplicates_removed: int
+    # one row per normalized review whose duplicates disagree on the sentiment
+    conflicts: pd.DataFrame
+
+
+def deduplicate_reviews(df_reviews: pd.DataFrame) -> Tuple[pd.DataFrame, DeduplicationReport]:
+    """
+    Notes :
+        reviews are grouped on their normalized text, which is what the model
+        sees, so that exact and near-exact duplicates (case, whitespaces) are
+        trained on once. each group keeps its first review, its majority
+        sentiment and as weight the number of reviews with that sentiment.
+        a group whose sentiments are tied is dropped : it carries no signal.
+        the groups with differing sentiments are reported as conflicts
+    """
+    normalized = df_reviews["review"].map(normalize_review).rename("normalized_review")
+    first_reviews = df_reviews["review"].groupby(normalized, sort=False).first()
+    counts = (
+        df_reviews.groupby([normalized, df_reviews["sentiment"]], sort=False)
+        .size()
+        .unstack(fill_value=0)
+        .reindex(first_reviews.index)
+        .sort_index(axis=1)
+        .rename_axis(columns=None)
+    )
+    majority_sentiments = counts.idxmax(axis=1)
+    majority_counts = counts.max(axis=1)
+    kept = counts.eq(majority_counts, axis=0).sum(axis=1) == 1
+    conflicting = (counts > 0).sum(axis=1) > 1
+
+    df_deduplicated = pd.DataFrame(
+        {
+            "review": first_reviews[kept].values,
+            "sentiment": majority_sentiments[kept].values.astype(int),
+            "weight": majority_counts[kept].values.astype(float),
+        }
+    )
+    conflicts = counts[conflicting].add_prefix("sentiment_count_")
+    conflicts.insert(0, "review", first_reviews[conflicting].values)
+    conflicts["kept_sentiment"] = majority_sentiments.where(kept)[conflicting].astype("Int64")
+    conflicts = conflicts.reset_index(drop=True)
+    return df_deduplicated, DeduplicationReport(
+        duplicates_removed=len(df_reviews) - len(df_deduplicated),
+        conflicts=conflicts,
+    )
@@ -0,0 +1,201 @@
+import logging
+import os
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.src.config import SETTINGS
+from app.src.datamodels import SENTIMENTS, ReviewsFileFormatEnum, ReviewsSource, TrainingInput
+from app.src.preprocessing import DeduplicationReport, deduplicate_reviews
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+GCS_URI_PREFIX = "gs://"
+DUPLICATE_CONFLICTS_REPORT_PATH = "app/data/duplicate_conflicts_report.csv"
+_DEFAULT_ENCODING = "utf-8"
+_PARQUET_COMPRESSION = "zstd"
+REVIEWS_PARQUET_SCHEMA = pa.schema([("review", pa.string()), ("sentiment", pa.int8())])
+
+
+def split_gcs_uri(uri: str) -> Tuple[str, str]:
+    bucket_name, _, blob_name = uri[len(GCS_URI_PREFIX):].partition("/")
+    if not bucket_name or not blob_name:
+        raise ValueError(f"expected gs://bucket/blob : {uri}")
+    return bucket_name, blob_name
+
+
+@contextmanager
+def open_reviews_file(path: str) -> Iterator[IO]:
+    if path.startswith(GCS_URI_PREFIX):
+        # the storage client is only needed, and authenticated, for blobs
+        from app.src.utils.data_io_services.cloud_storage import CloudStorageManager
+
+        bucket_name, blob_name = split_gcs_uri(path)
+        with CloudStorageManager().open_blob(bucket_name, blob_name) as f:
+            yield f
+    else:
+        with open(path, "rb") as f:
+            yield f
+
+
+def iter_reviews_chunks(
+    source: ReviewsSource,
+    chunk_size: int = SETTINGS.reviews_read_chunk_size,
+) -> Iterator[pd.DataFrame]:
+    """
+    Notes :
+        yields the review and sentiment columns of chunk_size rows at a time,
+        renamed review and sentiment. rows missing either one are dropped, a
+        sentiment other than 0 or 1 is an error
+    """
+    columns = {source.review_column: "review", source.sentiment_column: "sentiment"}
+    with open_reviews_file(source.path) as f:
+        for chunk in _iter_raw_chunks(f, source, list(columns), chunk_size):
+            missing_columns = set(columns) - set(chunk.columns)
+            if missing_columns:
+                raise ValueError(
+                    f"columns not found in {source.path} : {sorted(missing_columns)}"
+                )
+            chunk = chunk[list(columns)].rename(columns=columns).dropna()
+            is_valid_sentiment = chunk["sentiment"].isin(SENTIMENTS)
+            if not is_valid_sentiment.all():
+                invalid_sentiments = chunk["sentiment"][~is_valid_sentiment].unique()[:5]
+                raise ValueError(
+                    f"sentiments must be 0 or 1 in {source.path} : found {list(invalid_sentiments)}"
+                )
+            chunk["sentiment"] = chunk["sentiment"].astype(int)
+            yield chunk
+
+
+def _iter_raw_chunks(
+    f: IO, source: ReviewsSource, columns: list, chunk_size: int
+) -> Iterator[pd.DataFrame]:
+    if source.file_format == ReviewsFileFormatEnum.parquet:
+        # only the two columns are read, one row group at a time
+        parquet_file = pq.ParquetFile(f)
+        missing_columns = set(columns) - set(parquet_file.schema_arrow.names)
+        if missing_columns:
+            raise ValueError(f"columns not found in {source.path} : {sorted(missing_columns)}")
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    if source.file_format == ReviewsFileFormatEnum.jsonl:
+        reader = pd.read_json(
+            f, lines=True, chunksize=chunk_size, dtype=False, encoding=_DEFAULT_ENCODING
+        )
+    else:
+        separator = "\t" if source.file_format == ReviewsFileFormatEnum.tsv else SETTINGS.default_csv_separator
+        reader = pd.read_csv(
+            f,
+            sep=separator,
+            usecols=columns,
+            dtype={columns[0]: str},
+            chunksize=chunk_size,
+            encoding=_DEFAULT_ENCODING,
+        )
+    with reader:
+        yield from reader
+
+
+def read_reviews_file(
+    source: ReviewsSource,
+    chunk_size: int = SETTINGS.reviews_read_chunk_size,
+) -> pd.DataFrame:
+    """
+    Notes :
+        the file is streamed : at most one chunk of raw rows is parsed at a time.
+        the chunks only hold references to their review strings, so concatenating
+        them does not copy the text of the reviews
+    """
+    logging.info(f"reading reviews from {source.path} - start")
+    chunks = list(iter_reviews_chunks(source, chunk_size))
+    if not chunks:
+        raise ValueError(f"no reviews found in {source.path}")
+    df_reviews = pd.concat(chunks, ignore_index=True)
+    logging.info(f"reading reviews from {source.path} - end - {len(df_reviews)} reviews")
+    return df_reviews
+
+
+def convert_reviews_file_to_parquet(
+    source: ReviewsSource,
+    parquet_path: str,
+    chunk_size: int = SETTINGS.reviews_read_chunk_size,
+) -> int:
+    """
+    Notes :
+        streams the reviews of source into a zstd compressed parquet file of
+        review and sentiment columns, one row group per chunk, so that the
+        conversion of a large corpus never holds it in memory. the file is
+        written next to parquet_path then renamed
+
+    Returns :
+        the number of reviews written
+    """
+    logging.info(f"converting {source.path} to {parquet_path} - start")
+    tmp_parquet_path = f"{parquet_path}.tmp"
+    reviews_count = 0
+    try:
+        with pq.ParquetWriter(
+            tmp_parquet_path, REVIEWS_PARQUET_SCHEMA, compression=_PARQUET_COMPRESSION
+        ) as writer:
+            for chunk in iter_reviews_chunks(source, chunk_size):
+                writer.write_table(
+                    pa.Table.from_pandas(chunk, schema=REVIEWS_PARQUET_SCHEMA, preserve_index=False)
+                )
+                reviews_count += len(chunk)
+    except BaseException:
+        if os.path.exists(tmp_parquet_path):
+            os.remove(tmp_parquet_path)
+        raise
+    os.replace(tmp_parquet_path, parquet_path)
+    logging.info(f"converting {source.path} to {parquet_path} - end - {reviews_count} reviews")
+    return reviews_count
+
+
+def load_training_reviews(
+    inputs: TrainingInput,
+    write_report: bool = True,
+) -> Tuple[pd.DataFrame, Optional[DeduplicationReport]]:
+    """
+    Notes :
+        reviews and sentiments of the training, with the replay sample if
+        any, deduplicated if the training config says so, with a weight
+        column. the replay sample is seeded : a resumed training draws the
+        same one. the conflicts of the
+        deduplication are written to DUPLICATE_CONFLICTS_REPORT_PATH
+        (by a single process when write_report is False elsewhere)
+
+    Returns :
+        the reviews, and the deduplication report if deduplicated
+    """
+    df_reviews = inputs.to_frame()
+    if inputs.replay_source is not None:
+        df_replay = read_reviews_file(inputs.replay_source)
+        if len(df_replay) > inputs.replay_sample_size:
+            df_replay = df_replay.sample(
+                n=inputs.replay_sample_size, random_state=SETTINGS.training_seed
+            )
+        logging.info(f"mixing {len(df_replay)} replayed reviews with {len(df_reviews)} new ones")
+        df_reviews = pd.concat([df_reviews, df_replay], ignore_index=True)
+    if not inputs.training_config.deduplicate_reviews:
+        return df_reviews, None
+
+    reviews_count = len(df_reviews)
+    df_reviews, report = deduplicate_reviews(df_reviews)
+    logging.info(
+        f"deduplication : {reviews_count} reviews -> {len(df_reviews)}"
+        f" - {len(report.conflicts)} label conflicts"
+    )
+    if write_report:
+        report.conflicts.to_csv(DUPLICATE_CONFLICTS_REPORT_PATH, index=False)
+    if df_reviews.empty:
+        raise ValueError(
+            f"no review left after the deduplication of {reviews_count} reviews :"
+            f" the duplicates of every review are tied on the sentiment"
+            f" (see {DUPLICATE_CONFLICTS_REPORT_PATH})"
+        )
+    return df_reviews, report
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.src.config import SETTINGS
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+TOKENIZATION_CACHE_PATH = "app/data/tokenization_cache"
+
+
+def hash_reviews(reviews: Iterable[str]) -> str:
+    # length prefixed : ["ab", "c"] and ["a", "bc"] do not collide
+    sha = hashlib.sha256()
+    for review in reviews:
+        encoded = review.encode("utf-8")
+        sha.update(len(encoded).to_bytes(8, "little"))
+        sha.update(encoded)
+    return sha.hexdigest()
+
+
+def hash_tokenizer(tokenizer) -> str:
+    """
+    Notes :
+        the serialized fast tokenizer holds its vocabulary, normalizer and
+        special tokens : two tokenizers with the same hash encode alike. the
+        truncation and padding of the last call are serialized too, they are
+        left out of the hash
+    """
+    serialized = json.loads(tokenizer.backend_tokenizer.to_str())
+    serialized.pop("truncation", None)
+    serialized.pop("padding", None)
+    sha = hashlib.sha256(type(tokenizer).__name__.encode("utf-8"))
+    sha.update(json.dumps(serialized, sort_keys=True).encode("utf-8"))
+    return sha.hexdigest()
+
+
+class TokenizationCache:
+    """
+    Notes :
+        on disk cache of tokenized datasets, one directory per dataset keyed on
+        the content hash of the reviews and on the tokenizer identity, holding
+        one .npy file per array. the arrays depending on a max length carry it
+        in their name. arrays are read back memory-mapped copy-on-write : the
+        pages are only read from disk when a batch touches them and are shared
+        with the page cache, so a large corpus does not count in the process
+        RSS. only the max_entries most recently used datasets are kept
+        (cache disabled if max_entries <= 0)
+    """
+
+    def __init__(
+        self,
+        cache_path: str = TOKENIZATION_CACHE_PATH,
+        max_entries: int = SETTINGS.tokenization_cache_max_entries,
+    ):
+        self.cache_path: str = cache_path
+        self.max_entries: int = max_entries
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(reviews: Iterable[str], tokenizer, truncation_length: int) -> str:
+        return hashlib.sha256(
+            f"{hash_reviews(reviews)}:{hash_tokenizer(tokenizer)}:{truncation_length}".encode(
+                "utf-8"
+            )
+        ).hexdigest()
+
+    def _get_array_file_path(self, key: str, name: str) -> str:
+        return os.path.join(self.cache_path, key, f"{name}.npy")
+
+    def load(self, key: str, name: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        array_file_path = self._get_array_file_path(key, name)
+        if not os.path.isfile(array_file_path):
+            return None
+        # marks the dataset as recently used
+        os.utime(os.path.dirname(array_file_path))
+        return np.load(array_file_path, mmap_mode="c")
+
+    def save(self, key: str, name: str, array: np.ndarray) -> None:
+        if not self.enabled:
+            return
+        array_file_path = self._get_array_file_path(key, name)
+        os.makedirs(os.path.dirname(array_file_path), exist_ok=True)
+        # written next to the final file then renamed : a concurrent reader
+        # never maps half an array
+        tmp_file_path = f"{array_file_path}.tmp"
+        with open(tmp_file_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_file_path, array_file_path)
+        self._evict(keep_key=key)
+
+    def _evict(self, keep_key: str) -> None:
+        entries = sorted(
+            (
+                entry
+                for entry in os.scandir(self.cache_path)
+                if entry.is_dir() and entry.name != keep_key
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+        for entry in entries[self.max_entries - 1:]:
+            logging.info(f"evicting tokenized dataset {entry.name}")
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+TOKENIZATION_CACHE = TokenizationCache()
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import os
+import shutil
+import time
+from typing import Optional
+
+import torch
+
+from app.src.config import SETTINGS
+from app.src.tokenization_cache import hash_reviews
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+CHECKPOINTS_PATH = "app/models/checkpoints"
+CHECKPOINT_FILE_NAME = "checkpoint.pt"
+BEST_CHECKPOINT_FILE_NAME = "best_checkpoint.pt"
+
+
+def make_run_key(reviews, labels, training_config, weights=None, base_model_version=None) -> str:
+    """
+    Notes :
+        a training submitted again with the same reviews, labels, sample
+        weights, training config and base model resumes from the checkpoint
+        of the previous one
+    """
+    sha = hashlib.sha256(hash_reviews(reviews).encode("utf-8"))
+    sha.update(",".join(str(label) for label in labels).encode("utf-8"))
+    if weights is not None:
+        sha.update(",".join(str(weight) for weight in weights).encode("utf-8"))
+    if base_model_version is not None:
+        sha.update(base_model_version.encode("utf-8"))
+    sha.update(training_config.json(sort_keys=True).encode("utf-8"))
+    return sha.hexdigest()
+
+
+class TrainingCheckpointer:
+    """
+    Notes :
+        saves the model and optimizer states of a training run, with where the
+        run stands (phase, epoch, batch, sampler state and any state of the
+        training loop), at the end of every epoch and every interval_steps
+        optimizer steps (only at the end of epochs if interval_steps <= 0).
+        the torch random state is saved too : the dropout masks of a resumed
+        run are those of an uninterrupted one. with early stopping, the model
+        and optimizer states of the best validated epoch are saved apart so
+        that the run can go back to them.
+        the checkpoint is written next to the previous one then renamed : a
+        run killed while saving resumes from the previous checkpoint.
+        in a data parallel training, every rank loads the checkpoint but only
+        the writer (rank 0) saves or clears it
+    """
+
+    def __init__(
+        self,
+        run_key: str,
+        interval_steps: int,
+        checkpoints_path: str = CHECKPOINTS_PATH,
+        writer: bool = True,
+    ):
+        self.run_path: str = os.path.join(checkpoints_path, run_key)
+        self.interval_steps: int = interval_steps
+        self.writer: bool = writer
+
+    @property
+    def checkpoint_file_path(self) -> str:
+        return os.path.join(self.run_path, CHECKPOINT_FILE_NAME)
+
+    @property
+    def best_checkpoint_file_path(self) -> str:
+        return os.path.join(self.run_path, BEST_CHECKPOINT_FILE_NAME)
+
+    def is_due(self, optimizer_steps: int) -> bool:
+        return self.interval_steps > 0 and optimizer_steps % self.interval_steps == 0
+
+    def _write(self, checkpoint: dict, file_path: str) -> None:
+        os.makedirs(self.run_path, exist_ok=True)
+        tmp_file_path = f"{file_path}.tmp"
+        torch.save(checkpoint, tmp_file_path)
+        os.replace(tmp_file_path, file_path)
+
+    def save(self, model, optimizer, training_state: dict) -> None:
+        if not self.writer:
+            return
+        self._write(
+            {
+                "model": model.state_dict(),
+                "optimizer": optimizer.state_dict(),
+                "training_state": training_state,
+                "rng_state": torch.get_rng_state(),
+            },
+            self.checkpoint_file_path,
+        )
+        logging.info(
+            f"checkpoint saved - phase {training_state['phase']}"
+            f" - epoch {training_state['epoch']} - step {training_state['step']}"
+        )
+
+    def load(self, model, optimizer) -> Optional[dict]:
+        """
+        Returns :
+            the training state of the checkpoint once the model and optimizer
+            states are restored, None if there is no checkpoint for the run
+        """
+        if not os.path.isfile(self.checkpoint_file_path):
+            return None
+        checkpoint = torch.load(self.checkpoint_file_path)
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        torch.set_rng_state(checkpoint["rng_state"])
+        training_state = checkpoint["training_state"]
+        logging.info(
+            f"resuming from checkpoint - phase {training_state['phase']}"
+            f" - epoch {training_state['epoch']} - step {training_state['step']}"
+        )
+        return training_state
+
+    def save_best(self, model, optimizer) -> None:
+        if self.writer:
+            self._write(
+                {"model": model.state_dict(), "optimizer": optimizer.state_dict()},
+                self.best_checkpoint_file_path,
+            )
+
+    def load_best(self, model, optimizer) -> None:
+        checkpoint = torch.load(self.best_checkpoint_file_path)
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        logging.info("best validated epoch restored")
+
+    def clear(self) -> None:
+        if self.writer:
+            shutil.rmtree(self.run_path, ignore_errors=True)
+
+
+def prune_checkpoints(max_age_seconds: float, checkpoints_path: str = CHECKPOINTS_PATH) -> None:
+    """
+    Notes :
+        a completed run clears its checkpoints, a failed one leaves them to be
+        resumed. removes the runs not checkpointed for max_age_seconds. must
+        not run while a training runs on the node
+    """
+    if not os.path.isdir(checkpoints_path):
+        return
+    oldest_mtime = time.time() - max_age_seconds
+    for run_key in os.listdir(checkpoints_path):
+        run_path = os.path.join(checkpoints_path, run_key)
+        if not os.path.isdir(run_path):
+            continue
+        file_paths = [os.path.join(run_path, x) for x in os.listdir(run_path)]
+        last_mtime = max([os.path.getmtime(x) for x in file_paths] + [os.path.getmtime(run_path)])
+        if last_mtime < oldest_mtime:
+            logging.info(f"removing the checkpoints of the stale run {run_key}")
+            shutil.rmtree(run_path, ignore_errors=True)
@@ -0,0 +1,274 @@
+import datetime
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from typing import IO, Optional
+
+from app.src.config import SETTINGS
+from app.src.datamodels import (
+    JobStatusEnum,
+    TrainingInput,
+    TrainingJobOutput,
+)
+from app.src.executors import configure_torch_threads
+from app.src.model_registry import MODEL_REGISTRY, ModelRegistry
+
+logging.basicConfig(level=SETTINGS.log_level, format=SETTINGS.log_format)
+
+TRAINING_JOBS_PATH = "app/data/training_jobs"
+TRAINING_LOCK_FILE_NAME = "training.lock"
+
+_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_JOB_FILE_NAME_PATTERN = re.compile(r"^[0-9a-f]{32}\.json(\.tmp)?$")
+
+
+class TrainingJobAlreadyRunningError(Exception):
+    pass
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _get_job_file_path(jobs_path: str, job_id: str) -> str:
+    return os.path.join(jobs_path, f"{job_id}.json")
+
+
+def write_training_job(job: TrainingJobOutput, jobs_path: str = TRAINING_JOBS_PATH) -> None:
+    # written next to the final file then renamed : readers never see half a job
+    job_file_path = _get_job_file_path(jobs_path, job.job_id)
+    tmp_file_path = f"{job_file_path}.tmp"
+    with open(tmp_file_path, "w") as f:
+        f.write(job.json())
+    os.replace(tmp_file_path, job_file_path)
+
+
+def read_training_job(
+    job_id: str, jobs_path: str = TRAINING_JOBS_PATH
+) -> Optional[TrainingJobOutput]:
+    if not _JOB_ID_PATTERN.match(job_id):
+        return None
+    job_file_path = _get_job_file_path(jobs_path, job_id)
+    if not os.path.isfile(job_file_path):
+        return None
+    with open(job_file_path) as f:
+        return TrainingJobOutput(**json.load(f))
+
+
+def try_acquire_training_lock(jobs_path: str = TRAINING_JOBS_PATH) -> Optional[IO]:
+    """
+    Returns :
+        the lock file holding the node lock, closing it releases the lock,
+        None if a training job holds it. no training job can be submitted
+        on the node while the lock is held
+    """
+    os.makedirs(jobs_path, exist_ok=True)
+    lock_file = open(os.path.join(jobs_path, TRAINING_LOCK_FILE_NAME), "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def is_training_job_running(jobs_path: str = TRAINING_JOBS_PATH) -> bool:
+    # the node lock is held until the training process has exited
+    lock_file_path = os.path.join(jobs_path, TRAINING_LOCK_FILE_NAME)
+    if not os.path.isfile(lock_file_path):
+        return False
+    with open(lock_file_path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return False
+
+
+def prune_training_jobs(max_age_seconds: float, jobs_path: str = TRAINING_JOBS_PATH) -> None:
+    """
+    Notes :
+        removes the job files not written for max_age_seconds. a job file is
+        written at every step of its job : must only run under the node lock,
+        when no job is running
+    """
+    oldest_mtime = time.time() - max_age_seconds
+    for file_name in os.listdir(jobs_path):
+        file_path = os.path.join(jobs_path, file_name)
+        if _JOB_FILE_NAME_PATTERN.match(file_name) and os.path.getmtime(file_path) < oldest_mtime:
+            os.remove(file_path)
+
+
+def _prune_training_artifacts(jobs_path: str) -> None:
+    if SETTINGS.training_jobs_retention_days <= 0:
+        return
+    # imported in the training process only, the api workers do not need torch
+    from app.src.training_checkpoints import prune_checkpoints
+
+    max_age_seconds = SETTINGS.training_jobs_retention_days * 24 * 3600
+    try:
+        prune_training_jobs(max_age_seconds, jobs_path)
+        prune_checkpoints(max_age_seconds)
+    except OSError as e:
+        # the training does not fail for it
+        logging.warning(f"training jobs and checkpoints not pruned : {e!r}")
+
+
+def _finish_job(job: TrainingJobOutput, job_status: JobStatusEnum) -> None:
+    job.job_status = job_status
+    job.timestamp_end = _now()
+    job.duration_in_seconds = (
+        job.timestamp_end - (job.timestamp_start or job.timestamp_submitted)
+    ).total_seconds()
+
+
+def _run_training_job(job: TrainingJobOutput, inputs: TrainingInput, jobs_path: str) -> None:
+    """
+    Notes :
+        entry point of the training process. every step is written to the job
+        file, which is the only channel back to the api workers
+    """
+    job.job_status = JobStatusEnum.launched
+    job.timestamp_start = _now()
+    write_training_job(job, jobs_path)
+    # the node lock is held by the api worker until this process exits
+    _prune_training_artifacts(jobs_path)
+
+    def _report_progress(progress: float, message: str) -> None:
+        logging.info(f"training job {job.job_id} - {progress:.0%} - {message}")
+        job.progress = progress
+        job.progress_message = message
+        write_training_job(job, jobs_path)
+
+    try:
+        # imported in the training process only, the api workers do not need torch
+        from app.src.model_train import model_train
+
+        configure_torch_threads()
+        job.training_output = model_train(inputs, progress_callback=_report_progress)
+    except Exception as e:
+        logging.error(e, exc_info=True)
+        job.error = repr(e)
+        _finish_job(job, JobStatusEnum.failed)
+    else:
+        job.progress = 1.0
+        _finish_job(job, JobStatusEnum.completed)
+    write_training_job(job, jobs_path)
+
+
+class TrainingJobManager:
+    """
+    Notes :
+        each training runs in its own spawned process, so that it neither holds
+        the GIL nor the torch threads of the api worker that submitted it.
+        at most one job runs per node : the job holds an exclusive flock on a
+        lock file shared by every api worker of the node. the job status lives in
+        a json file per job, readable from any worker. once the process exits, a
+        monitor thread releases the lock and reloads the model registry
+    """
+
+    def __init__(
+        self,
+        jobs_path: str = TRAINING_JOBS_PATH,
+        model_registry: ModelRegistry = MODEL_REGISTRY,
+    ):
+        self.jobs_path: str = jobs_path
+        self.model_registry: ModelRegistry = model_registry
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._monitor_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _acquire_node_lock(self) -> IO:
+        lock_file = try_acquire_training_lock(self.jobs_path)
+        if lock_file is None:
+            raise TrainingJobAlreadyRunningError(
+                "a training job is already running on this node"
+            )
+        return lock_file
+
+    def submit(self, inputs: TrainingInput) -> TrainingJobOutput:
+        with self._lock:
+            lock_file = self._acquire_node_lock()
+            job = TrainingJobOutput(
+                job_id=uuid.uuid4().hex,
+                job_status=JobStatusEnum.to_run,
+                timestamp_submitted=_now(),
+            )
+            try:
+                write_training_job(job, self.jobs_path)
+                # spawn : a forked child would inherit the threads of the api worker
+                process = multiprocessing.get_context("spawn").Process(
+                    target=_run_training_job,
+                    args=(job, inputs, self.jobs_path),
+                    name=f"training-{job.job_id}",
+                )
+                process.start()
+            except Exception as e:
+                lock_file.close()
+                # a job left to_run would be pending forever
+                if os.path.isfile(_get_job_file_path(self.jobs_path, job.job_id)):
+                    job.error = repr(e)
+                    _finish_job(job, JobStatusEnum.failed)
+                    write_training_job(job, self.jobs_path)
+                raise
+            self._process = process
+            self._monitor_thread = threading.Thread(
+                target=self._monitor,
+                args=(process, job.job_id, lock_file),
+                name=f"training-monitor-{job.job_id}",
+                daemon=True,
+            )
+            self._monitor_thread.start()
+        logging.info(f"training job {job.job_id} submitted - pid {process.pid}")
+        return job
+
+    def _monitor(self, process, job_id: str, lock_file: IO) -> None:
+        process.join()
+        job = None
+        try:
+            job = read_training_job(job_id, self.jobs_path)
+            if job is not None and job.job_status not in [
+                JobStatusEnum.completed,
+                JobStatusEnum.failed,
+            ]:
+                # killed before it could write its own outcome
+                job.error = f"training process exited with code {process.exitcode}"
+                _finish_job(job, JobStatusEnum.failed)
+                write_training_job(job, self.jobs_path)
+        finally:
+            lock_file.close()
+            with self._lock:
+                if self._process is process:
+                    self._process = None
+
+        if job is None or job.job_status != JobStatusEnum.completed:
+            return
+        if not self.model_registry.follow_saved_model:
+            # reloaded by the app.serve parent, which restarts the workers
+            return
+        logging.info(f"training job {job_id} completed - reloading the model")
+        # serve the newly saved model from now on
+        self.model_registry.load()
+
+    def get(self, job_id: str) -> Optional[TrainingJobOutput]:
+        return read_training_job(job_id, self.jobs_path)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            process, monitor_thread = self._process, self._monitor_thread
+        if process is not None and process.is_alive():
+            logging.warning(f"terminating training process {process.pid}")
+            process.terminate()
+        if monitor_thread is not None:
+            # lets the monitor record the job as failed and release the lock
+            monitor_thread.join()
+
+
+TRAINING_JOB_MANAGER = TrainingJobManager()
@@ -6,6 +6,9 @@ from sklearn.tree import DecisionTreeClassifier
 
 import json
 
+from app.src.datamodels import ReviewsSource
+from app.src.reviews_io import convert_reviews_file_to_parquet
+
 
 
 df = pd.read_csv('app/data/Restaurant_Reviews.tsv', sep='\t')
@@ -15,4 +18,10 @@ df = df.rename(columns={'Review': 'review', 'Liked': 'sentiment'})
 dict_json = dict()
 dict_json["reviews_table"] = {"data": df.to_dict("records")}
 with open('app/data/reviews_data.json', 'w') as f:
-    json.dump(dict_json, f)
\ No newline at end of file
+    json.dump(dict_json, f)
+
+# columnar and compressed : read back by reviews_source {"path": "app/data/reviews_data.parquet"}
+convert_reviews_file_to_parquet(
+    ReviewsSource(path='app/data/Restaurant_Reviews.tsv', review_column='Review', sentiment_column='Liked'),
+    'app/data/reviews_data.parquet',
+)
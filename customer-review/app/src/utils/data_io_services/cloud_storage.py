@@ -123,6 +123,11 @@ class CloudStorageManager:
         r = blob.download_as_bytes(client=self.client)
         return r
 
+    def open_blob(self, bucket_name: str, blob_name: str, mode: str = "rb") -> IO:
+        # streams the blob in chunks instead of downloading it at once
+        blob = self.instantiate_blob(bucket_name=bucket_name, blob_name=blob_name)
+        return blob.open(mode=mode)
+
     def download_blob_as_pandas_dataframe(self, bucket_name, blob_name) -> pd.DataFrame:
         blob_as_bytes = self.download_blob_as_bytes(
             bucket_name=bucket_name, blob_name=blob_name
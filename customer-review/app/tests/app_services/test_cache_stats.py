@@ -0,0 +1,61 @@
+import json
+import sys
+import logging
+from app.src.config import SETTINGS
+from app.tests.helpers.api_services_checkers import ApiSettings, set_api_client
+
+logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(sys.stdout)])
+DATA_FOLDER_PATH = "app/tests/app_services/data/predict/test_predict_00.json"
+_NO_MODEL_SENTIMENT = "First train the model"
+
+
+def _get_cache_stats(api_client) -> dict:
+    response = api_client.get(endpoint_path="model_predict/cache_stats")
+    assert (
+    response.status_code == 200
+    ), f"check failed  : response.status_code == {response.status_code}"
+    return response.content_as_json
+
+
+def test_cache_stats():
+    with open(DATA_FOLDER_PATH) as f:
+        data = json.load(f)
+
+    endpoint_path = "model_predict/cache_stats"
+
+    logging.info(f"check endpoint {endpoint_path} - start")
+
+    settings_api = ApiSettings(
+        api_server_type=SETTINGS.test_api_server_type,
+        api_server_url=SETTINGS.test_api_server_url,
+    )
+
+    api_client = set_api_client(settings_api=settings_api)
+
+    stats_before = _get_cache_stats(api_client)
+    assert set(stats_before) == {
+        "size", "max_size", "ttl_seconds", "hits", "misses", "evictions", "hit_rate"
+    }, "check failed  : unexpected cache stats keys"
+    assert 0 <= stats_before["hit_rate"] <= 1, "check failed  : hit_rate out of [0, 1]"
+
+    # the second prediction of the same review is served by the cache
+    sentiments = [
+        api_client.post(endpoint_path="model_predict", data=data).content_as_json["sentiment"]
+        for _ in range(2)
+    ]
+    stats_after = _get_cache_stats(api_client)
+
+    if stats_after["max_size"] > 0 and _NO_MODEL_SENTIMENT not in sentiments:
+        assert (
+        stats_after["hits"] > stats_before["hits"]
+        ), "check failed  : the repeated review is expected to hit the cache"
+        assert (
+        stats_after["size"] <= stats_after["max_size"]
+        ), "check failed  : the cache is expected to stay within max_size"
+
+    logging.info(f"Cache stats: {stats_after}")
+    logging.info(f"check endpoint {endpoint_path} - end")
+
+
+if __name__ == "__main__":
+    test_cache_stats()
@@ -0,0 +1,45 @@
+import json
+import sys
+import logging
+from app.src.config import SETTINGS
+from app.tests.helpers.api_services_checkers import ApiSettings, set_api_client
+
+logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(sys.stdout)])
+DATA_FOLDER_PATH = "app/tests/app_services/data/predict_batch/test_predict_batch_00.json"
+
+
+def test_predict_batch():
+    with open(DATA_FOLDER_PATH) as f:
+        data = json.load(f)
+
+    endpoint_path = "model_predict_batch"
+
+    logging.info(f"check endpoint {endpoint_path} - start")
+
+    settings_api = ApiSettings(
+        api_server_type=SETTINGS.test_api_server_type,
+        api_server_url=SETTINGS.test_api_server_url,
+    )
+
+    api_client = set_api_client(settings_api=settings_api)
+
+    response = api_client.post(
+        endpoint_path=endpoint_path,
+        data=data,
+    )
+
+    assert (
+    response.status_code == 200
+    ), f"check failed  : response.status_code == {response.status_code}"
+
+    predictions = response.content_as_json["predictions"]
+    assert len(predictions) == len(
+        data["reviews"]
+    ), "check failed  : one prediction per review is expected"
+
+    logging.info(f"Sentiments: {[x['sentiment'] for x in predictions]}")
+    logging.info(f"check endpoint {endpoint_path} - end")
+
+
+if __name__ == "__main__":
+    test_predict_batch()
@@ -0,0 +1,57 @@
+import json
+import sys
+import logging
+from app.src.config import SETTINGS
+from app.tests.helpers.api_services_checkers import ApiSettings, set_api_client
+
+logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(sys.stdout)])
+DATA_FOLDER_PATH = "app/tests/app_services/data/predict_stream/test_predict_stream_00.ndjson"
+
+
+def test_predict_stream():
+    with open(DATA_FOLDER_PATH, "rb") as f:
+        data = f.read()
+
+    endpoint_path = "model_predict_stream"
+
+    logging.info(f"check endpoint {endpoint_path} - start")
+
+    settings_api = ApiSettings(
+        api_server_type=SETTINGS.test_api_server_type,
+        api_server_url=SETTINGS.test_api_server_url,
+    )
+
+    api_client = set_api_client(settings_api=settings_api)
+    api_client.init_session()
+
+    # the body is newline-delimited json, not a json document
+    response = api_client.session.post(
+        api_client.form_url(endpoint_path=endpoint_path),
+        data=data,
+        headers={"Content-Type": "application/x-ndjson"},
+        timeout=(api_client.connect_timeout, api_client.read_timeout),
+    )
+
+    assert (
+    response.status_code == 200
+    ), f"check failed  : response.status_code == {response.status_code}"
+
+    outputs = [json.loads(x) for x in response.text.splitlines()]
+    input_lines = [x for x in data.decode().splitlines() if x.strip()]
+    assert len(outputs) == len(
+        input_lines
+    ), "check failed  : one output line per non empty input line is expected"
+    assert [("sentiment" in x) for x in outputs] == [
+        True,
+        True,
+        False,
+        True,
+    ], f"check failed  : only the whitespace review is expected to fail : {outputs}"
+    assert outputs[2]["line_number"] == 4
+
+    logging.info(f"Outputs: {outputs}")
+    logging.info(f"check endpoint {endpoint_path} - end")
+
+
+if __name__ == "__main__":
+    test_predict_stream()
@@ -11,6 +11,9 @@ now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
 
 logging.basicConfig(level=logging.INFO, handlers=[logging.StreamHandler(sys.stdout)])
 DATA_FOLDER_PATH = "app/tests/app_services/data/train/reviews_data.json"
+REVIEWS_FILE_PATH = "app/data/Restaurant_Reviews.tsv"
+REVIEWS_PARQUET_FILE_PATH = "app/data/reviews_data.parquet"
+_SUBMIT_ATTEMPTS = 30
 
 def _define_time_to_wait_before_checking_if_job_is_completed(
     test_api_server_type: str,
@@ -28,6 +31,31 @@ def _define_time_to_wait_before_checking_if_job_is_completed(
     return time_to_wait
 
 
+def _wait_for_training_job(api_client, endpoint_path: str, response) -> dict:
+    job_id = response.content_as_json['job_id']
+    logging.info(f"training job submitted : {job_id}")
+
+    # wait for the training job to finish
+    time_to_wait = _define_time_to_wait_before_checking_if_job_is_completed(
+        test_api_server_type=SETTINGS.test_api_server_type
+    )
+    job_status = response.content_as_json['job_status']
+    while job_status in ['to_run', 'launched']:
+        time.sleep(time_to_wait.total_seconds())
+        response = api_client.get(
+            endpoint_path=endpoint_path + "/{job_id}",
+            path_params={"job_id": job_id},
+        )
+        assert (
+        response.status_code == 200
+        ), f"check failed  : response.status_code == {response.status_code}"
+        job_status = response.content_as_json['job_status']
+        logging.info(f"training job {job_status} : {response.content_as_json['progress_message']}")
+
+    assert job_status == 'completed', f"check failed  : {response.content_as_json['error']}"
+    return response.content_as_json['training_output']
+
+
 def test_train():
     f = open(DATA_FOLDER_PATH)
     data = json.load(f)
@@ -53,22 +81,89 @@ def test_train():
     )
 
     assert (
-    response.status_code == 200
+    response.status_code == 202
     ), f"check failed  : response.status_code == {response.status_code}"
 
-    # wait for the training to finish
-    time_to_wait = _define_time_to_wait_before_checking_if_job_is_completed(
-        test_api_server_type=SETTINGS.test_api_server_type
-    )
-    
-    time.sleep(time_to_wait.total_seconds())
+    training_output = _wait_for_training_job(api_client, endpoint_path, response)
 
     logging.info("response received")
-    logging.info(f"Accuracy Score : {response.content_as_json['accuracy_score']}")
+    logging.info(f"Accuracy Score : {training_output['accuracy_score']}")
     logging.info(f"check endpoint {endpoint_path} - end")
     
     with open('app/tests/app_services/data/train/predicted_value.json', 'w') as outfile:
-        json.dump({'Accuracy Score': response.content_as_json['accuracy_score']}, outfile)
+        json.dump({'Accuracy Score': training_output['accuracy_score']}, outfile)
     
+
+def _check_training_endpoint(data: dict, description: str) -> dict:
+    endpoint_path = "model_training"
+
+    logging.info(f"check endpoint {endpoint_path} from {description} - start")
+
+    settings_api = ApiSettings(
+        api_server_type=SETTINGS.test_api_server_type,
+        api_server_url=SETTINGS.test_api_server_url,
+    )
+
+    api_client = set_api_client(settings_api=settings_api)
+
+    # the process of the previous training job may still be exiting
+    # after its completion : the node is busy until it has exited
+    for _ in range(_SUBMIT_ATTEMPTS):
+        response = api_client.post(
+            endpoint_path=endpoint_path,
+            data=data,
+            query_params={"test_mode": True},
+        )
+        if response.status_code != 409:
+            break
+        time.sleep(1)
+
+    assert (
+    response.status_code == 202
+    ), f"check failed  : response.status_code == {response.status_code}"
+
+    training_output = _wait_for_training_job(api_client, endpoint_path, response)
+
+    logging.info(f"Accuracy Score : {training_output['accuracy_score']}")
+    logging.info(f"check endpoint {endpoint_path} from {description} - end")
+    return training_output
+
+
+def test_train_from_file():
+    # the reviews are read from the file by the training job, not sent inline
+    data = {
+        "reviews_source": {
+            "path": REVIEWS_FILE_PATH,
+            "review_column": "Review",
+            "sentiment_column": "Liked",
+        },
+        "engine": "tfidf_logistic_regression",
+    }
+    _check_training_endpoint(data, description="a file")
+
+
+def test_train_from_parquet():
+    data = {
+        "reviews_source": {"path": REVIEWS_PARQUET_FILE_PATH},
+        "engine": "tfidf_logistic_regression",
+    }
+    _check_training_endpoint(data, description="a parquet file")
+
+
+def test_train_from_columns():
+    f = open(DATA_FOLDER_PATH)
+    rows = json.load(f)["reviews_table"]["data"]
+
+    # one array per column instead of one object per review
+    data = {
+        "reviews_columns": {
+            "review": [row["review"] for row in rows],
+            "sentiment": [row["sentiment"] for row in rows],
+        },
+        "engine": "tfidf_logistic_regression",
+    }
+    _check_training_endpoint(data, description="columns")
+
+
 if __name__ == "__main__":
     test_train()
\ No newline at end of file
@@ -0,0 +1,27 @@
+import torch
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+TINY_BERT_WORDS = ["good", "great", "tasty", "friendly", "bad", "awful", "cold", "slow", "food", "service"]
+
+
+def save_tiny_bert(model_path: str, vocab_path: str) -> str:
+    """
+    Notes :
+        saves a randomly initialised one layer bert and its tokenizer over
+        TINY_BERT_WORDS, for the tests that must not download bert-base-uncased
+    """
+    with open(vocab_path, "w") as vocab_file:
+        vocab_file.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + TINY_BERT_WORDS))
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path)
+    config = BertConfig(
+        vocab_size=tokenizer.vocab_size,
+        hidden_size=16,
+        num_hidden_layers=1,
+        num_attention_heads=2,
+        intermediate_size=32,
+        max_position_embeddings=64,
+    )
+    torch.manual_seed(0)
+    BertForSequenceClassification(config).save_pretrained(model_path)
+    tokenizer.save_pretrained(model_path)
+    return model_path
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from app import main
+from app.src.datamodels import ModelPredictInput, ModelPredictOutput
+from app.src.model_registry import ENGINE_BERT, ENGINE_TFIDF_LOGISTIC_REGRESSION, LoadedModel
+
+
+class _LoadedModelRegistry:
+    def __init__(self, engine: str):
+        self.loaded_model = LoadedModel(
+            model=None,
+            tokenizer=None,
+            model_version="v1",
+            backend="pytorch",
+            max_length=16,
+            engine=engine,
+            bf16_autocast=False,
+        )
+
+    def peek(self):
+        return self.loaded_model
+
+
+class _EchoMicroBatcher:
+    async def submit(self, inputs):
+        return ModelPredictOutput(sentiment="micro-batched")
+
+
+@pytest.fixture(autouse=True)
+def predictions(monkeypatch):
+    monkeypatch.setattr(main.SETTINGS, "micro_batching_enabled", True)
+    monkeypatch.setattr(main, "MICRO_BATCHER", _EchoMicroBatcher())
+    monkeypatch.setattr(
+        main, "model_predict", lambda inputs: ModelPredictOutput(sentiment="predicted")
+    )
+
+
+@pytest.mark.parametrize(
+    "engine, sentiment",
+    [(ENGINE_TFIDF_LOGISTIC_REGRESSION, "predicted"), (ENGINE_BERT, "micro-batched")],
+)
+def test_only_the_bert_model_is_micro_batched(monkeypatch, engine, sentiment):
+    monkeypatch.setattr(main, "MODEL_REGISTRY", _LoadedModelRegistry(engine))
+
+    outputs = asyncio.run(main.predict(ModelPredictInput(review="good")))
+
+    assert outputs.sentiment == sentiment
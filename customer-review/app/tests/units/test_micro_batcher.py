@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.src import micro_batcher
+from app.src.datamodels import ModelPredictBatchOutput, ModelPredictInput, ModelPredictOutput
+from app.src.micro_batcher import MicroBatcher
+
+
+class _NoModelRegistry:
+    # no loaded model : every prediction goes through a batch
+    def peek(self):
+        return None
+
+
+@pytest.fixture
+def predicted_batches(monkeypatch):
+    # the reviews of each batch sent to the model, which echoes them back
+    batches = []
+
+    def model_predict_batch(inputs, model_registry):
+        batches.append(list(inputs.reviews))
+        return ModelPredictBatchOutput(
+            predictions=[ModelPredictOutput(sentiment=review) for review in inputs.reviews]
+        )
+
+    monkeypatch.setattr(micro_batcher, "model_predict_batch", model_predict_batch)
+    return batches
+
+
+def _batcher(max_batch_size: int = 32, max_wait_ms: float = 50) -> MicroBatcher:
+    return MicroBatcher(
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+        model_registry=_NoModelRegistry(),
+    )
+
+
+async def _submit_all(batcher: MicroBatcher, reviews, return_exceptions: bool = False):
+    return await asyncio.gather(
+        *[batcher.submit(ModelPredictInput(review=review)) for review in reviews],
+        return_exceptions=return_exceptions,
+    )
+
+
+def test_concurrent_submits_are_batched(predicted_batches):
+    reviews = ["good", "bad", "ok", "slow"]
+
+    outputs = asyncio.run(_submit_all(_batcher(), reviews))
+
+    # each caller gets the output of its own review
+    assert [output.sentiment for output in outputs] == reviews
+    assert predicted_batches == [reviews]
+
+
+def test_batch_is_flushed_at_max_batch_size(predicted_batches):
+    reviews = ["a", "b", "c", "d"]
+
+    # full batches do not wait for max_wait_ms
+    outputs = asyncio.run(
+        asyncio.wait_for(_submit_all(_batcher(max_batch_size=2, max_wait_ms=60_000), reviews), 5)
+    )
+
+    assert [output.sentiment for output in outputs] == reviews
+    assert predicted_batches == [["a", "b"], ["c", "d"]]
+
+
+def test_batch_is_flushed_after_max_wait(predicted_batches):
+    async def submit_apart(batcher):
+        first = asyncio.create_task(batcher.submit(ModelPredictInput(review="first")))
+        # the first batch does not wait for a second review beyond max_wait_ms
+        await asyncio.sleep(0.2)
+        assert first.done()
+        second = await batcher.submit(ModelPredictInput(review="second"))
+        return (await first).sentiment, second.sentiment
+
+    assert asyncio.run(submit_apart(_batcher(max_wait_ms=20))) == ("first", "second")
+    assert predicted_batches == [["first"], ["second"]]
+
+
+def test_cancelled_predictions_are_skipped(predicted_batches):
+    async def submit_and_cancel(batcher):
+        tasks = [
+            asyncio.create_task(batcher.submit(ModelPredictInput(review=review)))
+            for review in ["kept", "cancelled", "also kept"]
+        ]
+        # every review is queued, the batch is still being collected
+        await asyncio.sleep(0.01)
+        tasks[1].cancel()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    outputs = asyncio.run(submit_and_cancel(_batcher(max_wait_ms=100)))
+
+    assert outputs[0].sentiment == "kept"
+    assert isinstance(outputs[1], asyncio.CancelledError)
+    assert outputs[2].sentiment == "also kept"
+    assert predicted_batches == [["kept", "also kept"]]
+
+
+def test_batch_error_is_raised_to_every_caller(monkeypatch):
+    def model_predict_batch(inputs, model_registry):
+        raise RuntimeError("prediction failed")
+
+    monkeypatch.setattr(micro_batcher, "model_predict_batch", model_predict_batch)
+
+    outputs = asyncio.run(_submit_all(_batcher(), ["good", "bad"], return_exceptions=True))
+
+    assert [type(output) for output in outputs] == [RuntimeError, RuntimeError]
+    assert all(str(output) == "prediction failed" for output in outputs)
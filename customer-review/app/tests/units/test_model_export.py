@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from app.src.model_export import (
+    export_model_to_onnx,
+    get_onnx_model_file_path,
+    get_onnx_tokenizer_file_path,
+)
+from app.src.model_registry import ModelRegistry
+from app.tests.helpers.tiny_bert import save_tiny_bert
+
+
+@pytest.fixture
+def tiny_model_path(tmp_path) -> str:
+    model_path = save_tiny_bert(str(tmp_path / "saved_model"), str(tmp_path / "vocab.txt"))
+    # save_pretrained writes tokenizer.json, the export writes it when missing
+    os.remove(get_onnx_tokenizer_file_path(model_path))
+    return model_path
+
+
+def test_onnxruntime_backend_does_not_export_the_model(tiny_model_path):
+    registry = ModelRegistry(model_path=tiny_model_path, backend="onnxruntime")
+
+    with pytest.raises(FileNotFoundError, match="python -m app.src.model_export"):
+        registry.load()
+    assert not os.path.exists(get_onnx_model_file_path(tiny_model_path))
+
+
+def test_exported_model_is_served_by_onnxruntime(tiny_model_path):
+    export_model_to_onnx(tiny_model_path)
+
+    # the files are renamed into place, no temporary file is left behind
+    assert not [x for x in os.listdir(tiny_model_path) if ".tmp-" in x]
+    assert os.path.isfile(get_onnx_tokenizer_file_path(tiny_model_path))
+    registry = ModelRegistry(model_path=tiny_model_path, backend="onnxruntime")
+    assert registry.load()
+    assert registry.get().backend == "onnxruntime"
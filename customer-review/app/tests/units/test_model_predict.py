@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.src.model_predict import predict_sentiments
+from app.src.model_registry import ENGINE_BERT, LoadedModel
+
+
+class _WordTokenizer:
+    # a tokenizers.Tokenizer giving one token per word
+    def encode_batch(self, reviews):
+        return [
+            SimpleNamespace(
+                ids=[1] * len(review.split()),
+                type_ids=[0] * len(review.split()),
+                attention_mask=[1] * len(review.split()),
+            )
+            for review in reviews
+        ]
+
+
+class _LengthParitySession:
+    """
+    Notes :
+        an onnxruntime session predicting positive the reviews of an odd
+        number of words, recording the padded width of each batch
+    """
+
+    def __init__(self):
+        self.batch_widths = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=name) for name in ["input_ids", "attention_mask"]]
+
+    def run(self, output_names, inputs):
+        self.batch_widths.append(inputs["input_ids"].shape[1])
+        odd = inputs["attention_mask"].sum(axis=1) % 2
+        return [np.stack([1 - odd, odd], axis=1).astype(np.float32)]
+
+
+def test_sentiments_are_returned_in_the_order_of_the_reviews():
+    session = _LengthParitySession()
+    loaded_model = LoadedModel(
+        model=session,
+        tokenizer=_WordTokenizer(),
+        model_version="v1",
+        backend="onnxruntime",
+        max_length=16,
+        engine=ENGINE_BERT,
+        bf16_autocast=False,
+    )
+    word_counts = [5, 2, 7, 1, 4, 3, 6]
+    reviews = [" ".join(["word"] * word_count) for word_count in word_counts]
+
+    sentiments = predict_sentiments(reviews, loaded_model, batch_size=2)
+
+    assert sentiments == [
+        "positive" if word_count % 2 else "negative" for word_count in word_counts
+    ]
+    # sorted by length, each bucket is only padded to its own longest review
+    assert session.batch_widths == [2, 4, 6, 7]
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+from fastapi import HTTPException
+
+from app.src import model_predict_stream
+from app.src.model_predict_stream import stream_predictions
+
+
+class _NoModelRegistry:
+    # every review is answered without a model
+    def get(self):
+        return None
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def _stream(*chunks: bytes, model_registry=None, **kwargs) -> list:
+    async def read_stream():
+        return [
+            output
+            async for output in stream_predictions(
+                _chunks(*chunks), model_registry=model_registry or _NoModelRegistry(), **kwargs
+            )
+        ]
+
+    return [json.loads(line) for line in b"".join(asyncio.run(read_stream())).splitlines()]
+
+
+def test_line_longer_than_max_line_bytes_is_answered_with_an_error():
+    outputs = _stream(
+        b'{"review": "good"}\n{"review": "' + b"x" * 20,
+        b"x" * 20,
+        b'"}\n{"review": "fine"}\n{"review": "' + b"y" * 40,
+        max_line_bytes=32,
+    )
+
+    assert [output.get("line_number") for output in outputs] == [None, 2, None, 4]
+    assert outputs[1]["error"] == "line longer than 32 bytes"
+    assert outputs[3]["error"] == "line longer than 32 bytes"
+
+
+def test_prediction_error_is_answered_on_the_lines_of_the_batch(monkeypatch):
+    predict_batch = model_predict_stream.model_predict_batch
+
+    def model_predict_batch(inputs, model_registry):
+        if "bad" in inputs.reviews:
+            raise HTTPException(status_code=500, detail="Error during prediction: bad")
+        return predict_batch(inputs=inputs, model_registry=model_registry)
+
+    monkeypatch.setattr(model_predict_stream, "model_predict_batch", model_predict_batch)
+
+    outputs = _stream(
+        b'{"review": "good"}\n{"review": "bad"}\n{"review": "ok"}\n{"review": "fine"}\n',
+        batch_size=2,
+    )
+
+    # the stream goes on with the next batch
+    assert outputs[:2] == [
+        {"line_number": 1, "error": "Error during prediction: bad"},
+        {"line_number": 2, "error": "Error during prediction: bad"},
+    ]
+    assert [("sentiment" in output) for output in outputs[2:]] == [True, True]
+
+
+class _BrokenModelRegistry:
+    # the saved model cannot be loaded
+    def get(self):
+        raise FileNotFoundError("model.onnx not found")
+
+
+def test_model_loading_error_is_answered_on_the_lines_of_the_batch():
+    outputs = _stream(
+        b'{"review": "good"}\n{"review": "bad"}\n', model_registry=_BrokenModelRegistry()
+    )
+
+    assert outputs == [
+        {"line_number": 1, "error": "Error during prediction: model.onnx not found"},
+        {"line_number": 2, "error": "Error during prediction: model.onnx not found"},
+    ]
+
+
+def test_unexpected_error_is_answered_on_the_lines_of_the_batch(monkeypatch):
+    def model_predict_batch(inputs, model_registry):
+        raise RuntimeError("worker pool closed")
+
+    monkeypatch.setattr(model_predict_stream, "model_predict_batch", model_predict_batch)
+
+    outputs = _stream(b'{"review": "good"}\n')
+
+    assert outputs == [{"line_number": 1, "error": "Error during prediction: worker pool closed"}]
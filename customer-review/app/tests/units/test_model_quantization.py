@@ -0,0 +1,55 @@
+import os
+
+import pytest
+import torch
+from transformers import BertForSequenceClassification, BertTokenizerFast
+
+from app.src.model_quantization import (
+    get_quantized_model_file_path,
+    load_quantized_model,
+    quantize_model,
+    quantize_saved_model,
+)
+from app.src.model_registry import ModelRegistry
+from app.tests.helpers.tiny_bert import TINY_BERT_WORDS, save_tiny_bert
+
+
+@pytest.fixture
+def tiny_model_path(tmp_path) -> str:
+    return save_tiny_bert(str(tmp_path / "saved_model"), str(tmp_path / "vocab.txt"))
+
+
+def _logits(model: torch.nn.Module, model_path: str) -> torch.Tensor:
+    tokenizer = BertTokenizerFast.from_pretrained(model_path)
+    encodings = tokenizer(
+        [" ".join(TINY_BERT_WORDS[:4]), TINY_BERT_WORDS[4]], padding=True, return_tensors="pt"
+    )
+    with torch.no_grad():
+        return model(**encodings).logits
+
+
+def test_saved_model_is_quantized_then_loaded_back(tiny_model_path):
+    quantize_saved_model(tiny_model_path)
+
+    # renamed into place, no temporary file is left behind
+    assert os.path.isfile(get_quantized_model_file_path(tiny_model_path))
+    assert not [x for x in os.listdir(tiny_model_path) if ".tmp-" in x]
+
+    model = BertForSequenceClassification.from_pretrained(tiny_model_path)
+    model.eval()
+    expected_logits = _logits(quantize_model(model), tiny_model_path)
+    loaded_model = load_quantized_model(tiny_model_path)
+    assert isinstance(loaded_model.classifier, torch.ao.nn.quantized.dynamic.Linear)
+    assert torch.equal(_logits(loaded_model, tiny_model_path), expected_logits)
+
+
+def test_quantized_saved_model_is_served_with_quantized_inference(tiny_model_path):
+    registry = ModelRegistry(model_path=tiny_model_path, quantized=True)
+    assert registry.load()
+    # trained without quantize_model : the fp32 model is served
+    assert not registry.get().model_version.endswith("-int8")
+
+    quantize_saved_model(tiny_model_path)
+
+    assert registry.load()
+    assert registry.get().model_version.endswith("-int8")
@@ -0,0 +1,197 @@
+import numpy as np
+import pytest
+import torch
+from transformers import BertForSequenceClassification, BertTokenizerFast
+
+from app.src import model_train
+from app.src.datamodels import ReviewsColumns, TrainingConfig, TrainingInput
+from app.src.model_registry import SAVED_MODEL_PATH, read_model_metadata
+from app.src.training_checkpoints import TrainingCheckpointer
+from app.tests.helpers.tiny_bert import TINY_BERT_WORDS as _WORDS, save_tiny_bert
+
+
+class _Interrupted(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def tiny_pretrained_model(tmp_path, monkeypatch):
+    # the relative app/ paths of the training land in tmp_path
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app" / "data").mkdir(parents=True)
+
+    model_path = save_tiny_bert(str(tmp_path / "tiny_bert"), str(tmp_path / "vocab.txt"))
+    monkeypatch.setattr(model_train, "_PRETRAINED_MODEL_NAME", model_path)
+
+
+def _training_input(**training_config) -> TrainingInput:
+    positive, negative = _WORDS[:4], _WORDS[4:8]
+    reviews = [f"{positive[i % 4]} {_WORDS[8 + i % 2]} {positive[(i + 1) % 4]}" for i in range(20)]
+    reviews += [f"{negative[i % 4]} {_WORDS[8 + i % 2]} {negative[(i + 1) % 4]}" for i in range(20)]
+    return TrainingInput(
+        reviews_columns=ReviewsColumns(review=reviews, sentiment=[1] * 20 + [0] * 20),
+        training_config=TrainingConfig(batch_size=4, learning_rate=1e-3, **training_config),
+    )
+
+
+def _train(inputs: TrainingInput):
+    # dropout draws from the torch random state, seeded as a new process would be
+    torch.manual_seed(101)
+    output = model_train.model_train(inputs)
+    return output, BertForSequenceClassification.from_pretrained(SAVED_MODEL_PATH).state_dict()
+
+
+def test_resumed_training_matches_an_uninterrupted_one(monkeypatch):
+    inputs = _training_input(epochs=2, checkpoint_interval_steps=3)
+    expected_output, expected_weights = _train(inputs)
+
+    save = TrainingCheckpointer.save
+
+    def save_then_interrupt(self, model, optimizer, training_state):
+        save(self, model, optimizer, training_state)
+        # interrupted after a checkpoint saved in the middle of the second epoch
+        if training_state["epoch"] == 1 and training_state["step"] > 0:
+            raise _Interrupted()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(TrainingCheckpointer, "save", save_then_interrupt)
+        with pytest.raises(_Interrupted):
+            _train(inputs)
+
+    output, weights = _train(inputs)
+
+    assert output == expected_output
+    assert weights.keys() == expected_weights.keys()
+    for name, tensor in weights.items():
+        assert torch.equal(tensor, expected_weights[name]), name
+
+
+@pytest.fixture
+def validated_weights(monkeypatch):
+    """
+    Notes :
+        the validations score 5, 8, 6 then 6 correct predictions out of 10 and
+        record the weights of the model they validated
+    """
+    weights = []
+    correct_predictions = iter([5, 8, 6, 6])
+    evaluate = model_train._evaluate
+
+    def _evaluate(model, data_loader, bf16_autocast=False):
+        evaluate(model, data_loader, bf16_autocast)
+        weights.append({k: v.clone() for k, v in model.state_dict().items()})
+        correct = next(correct_predictions)
+        return [1] * correct + [0] * (10 - correct), [1] * 10
+
+    monkeypatch.setattr(model_train, "_evaluate", _evaluate)
+    return weights
+
+
+def test_early_stopping_keeps_the_best_epoch(validated_weights):
+    messages = []
+
+    output = model_train.model_train(
+        _training_input(epochs=10, early_stopping_patience=2, retrain_on_full_data=False),
+        progress_callback=lambda progress, message: messages.append(message),
+    )
+
+    # stopped after 2 epochs without improvement on the second one
+    assert "validation epoch 4/10" in messages
+    assert "validation epoch 5/10" not in messages
+    assert output.epochs_trained == 2
+    assert output.accuracy_score == 0.8
+    saved_weights = BertForSequenceClassification.from_pretrained(SAVED_MODEL_PATH).state_dict()
+    for name, tensor in saved_weights.items():
+        assert torch.equal(tensor, validated_weights[1][name]), name
+
+
+def test_full_data_retrain_runs_as_many_epochs_as_the_best_one(validated_weights):
+    messages = []
+
+    model_train.model_train(
+        _training_input(epochs=10, early_stopping_patience=2),
+        progress_callback=lambda progress, message: messages.append(message),
+    )
+
+    assert "training on the full dataset epoch 2/2" in messages
+    assert not [x for x in messages if x.startswith("training on the full dataset epoch 3")]
+
+
+def _shards(num_replicas: int, shuffle: bool, seed: int = 0) -> tuple:
+    # the batches of one epoch of every replica, as lists of review indices
+    lengths = np.random.default_rng(0).integers(1, 50, size=23)
+    indices = np.arange(3, 23)
+    samplers = [
+        model_train.LengthBucketBatchSampler(
+            lengths, batch_size=3, shuffle=shuffle, bucket_size_in_batches=2, seed=seed,
+            indices=indices, num_replicas=num_replicas, rank=rank,
+        )
+        for rank in range(num_replicas)
+    ]
+    return [[batch.tolist() for batch in sampler] for sampler in samplers], samplers
+
+
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_replicas_together_sample_every_index(shuffle):
+    shards, _ = _shards(num_replicas=3, shuffle=shuffle)
+
+    sampled = [index for shard in shards for batch in shard for index in batch]
+    assert set(sampled) == set(range(3, 23))
+    if not shuffle:
+        # validated once each
+        assert len(sampled) == 20
+
+
+def test_training_replicas_run_as_many_steps():
+    # 7 batches of 3 reviews padded to 9 : the replicas stay synchronized
+    shards, samplers = _shards(num_replicas=3, shuffle=True)
+
+    assert [len(shard) for shard in shards] == [3, 3, 3]
+    assert [len(sampler) for sampler in samplers] == [3, 3, 3]
+
+
+def test_training_batches_are_deterministic_per_epoch():
+    (first_shard,), (first_sampler,) = _shards(num_replicas=1, shuffle=True)
+    (same_shard,), (same_sampler,) = _shards(num_replicas=1, shuffle=True)
+    (other_seed_shard,), _ = _shards(num_replicas=1, shuffle=True, seed=1)
+
+    assert same_shard == first_shard
+    assert other_seed_shard != first_shard
+    # every epoch is shuffled anew, alike for every sampler of the same seed
+    second_epoch = [batch.tolist() for batch in first_sampler]
+    assert second_epoch != first_shard
+    assert [batch.tolist() for batch in same_sampler] == second_epoch
+
+
+def test_padded_token_ids_match_the_tokenizer_truncation(tmp_path):
+    tokenizer = BertTokenizerFast.from_pretrained(str(tmp_path / "tiny_bert"))
+    reviews = ["good", "good food", "good great tasty friendly food", " ".join(_WORDS)]
+    token_ids = model_train._tokenize(tokenizer, reviews)
+    lengths = np.array([len(ids) for ids in token_ids])
+
+    input_ids = model_train._pad_token_ids(
+        token_ids, lengths, 4, tokenizer.pad_token_id, tokenizer.sep_token_id
+    )
+
+    # the reviews longer than 4 tokens end with [SEP], the shorter ones are padded
+    expected = tokenizer(reviews, truncation=True, max_length=4, padding="max_length")
+    assert input_ids.tolist() == expected["input_ids"]
+    assert input_ids[2:, 3].tolist() == [tokenizer.sep_token_id] * 2
+
+
+def test_fine_tuning_starts_from_the_saved_model(monkeypatch):
+    inputs = _training_input(epochs=1)
+    fine_tune_inputs = inputs.copy(update={"fine_tune_saved_model": True})
+    with pytest.raises(FileNotFoundError, match="no saved model to fine-tune"):
+        model_train._get_base_model(fine_tune_inputs)
+    model_train.model_train(inputs)
+    saved_model_version = read_model_metadata(SAVED_MODEL_PATH)["model_version"]
+    # the pretrained model is out of reach : only the saved one can be trained from
+    monkeypatch.setattr(model_train, "_PRETRAINED_MODEL_NAME", "no-pretrained-model")
+
+    assert model_train._get_base_model(fine_tune_inputs) == (SAVED_MODEL_PATH, saved_model_version)
+    output = model_train.model_train(fine_tune_inputs)
+
+    # the saved model is validated before it is fine-tuned
+    assert output.base_accuracy_score is not None
+    assert read_model_metadata(SAVED_MODEL_PATH)["base_model_version"] == saved_model_version
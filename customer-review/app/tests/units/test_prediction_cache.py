@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from app.src import model_predict
+from app.src.model_predict import lookup_cached_sentiment, predict_sentiments_with_cache
+from app.src.model_registry import LoadedModel
+from app.src.prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def predicted_reviews(monkeypatch):
+    # the reviews sent to the model, which predicts them all positive
+    reviews = []
+
+    def predict_sentiments(batch, loaded_model):
+        reviews.extend(batch)
+        return ["positive"] * len(batch)
+
+    monkeypatch.setattr(model_predict, "predict_sentiments", predict_sentiments)
+    return reviews
+
+
+def _loaded_model(model_version: str = "v1") -> LoadedModel:
+    return LoadedModel(model=None, tokenizer=None, model_version=model_version)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_size=2, ttl_seconds=0)
+    cache.put("a", "positive")
+    cache.put("b", "negative")
+    assert cache.get("a") == "positive"
+
+    cache.put("c", "positive")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "positive"
+    assert cache.get("c") == "positive"
+    assert cache.stats().evictions == 1
+    assert cache.stats().size == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache = PredictionCache(max_size=10, ttl_seconds=60)
+    cache.put("a", "positive")
+
+    now += 60
+    assert cache.get("a") == "positive"
+    now += 1
+    assert cache.get("a") is None
+    assert cache.stats().size == 0
+    assert (cache.stats().hits, cache.stats().misses) == (1, 1)
+
+
+def test_cache_is_disabled_without_size(predicted_reviews):
+    cache = PredictionCache(max_size=0, ttl_seconds=0)
+    cache.put("a", "positive")
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+    assert lookup_cached_sentiment("good", _loaded_model(), cache) is None
+    assert predict_sentiments_with_cache(["good", "good"], _loaded_model(), cache) == ["positive"] * 2
+    assert predict_sentiments_with_cache(["good"], _loaded_model(), cache) == ["positive"]
+    assert predicted_reviews == ["good", "good", "good"]
+    assert cache.stats().size == 0
+
+
+def test_hits_and_misses_are_counted(predicted_reviews):
+    cache = PredictionCache(max_size=10, ttl_seconds=0)
+
+    # a single review lookup records no miss, its prediction records it
+    assert lookup_cached_sentiment("Good  food", _loaded_model(), cache) is None
+    assert cache.stats().misses == 0
+    predict_sentiments_with_cache(["Good  food", "good food", "bad"], _loaded_model(), cache)
+    # the review is normalized, each distinct review is predicted once
+    assert len(predicted_reviews) == 2
+    assert (cache.stats().hits, cache.stats().misses) == (0, 2)
+
+    assert lookup_cached_sentiment("GOOD FOOD", _loaded_model(), cache) == "positive"
+    predict_sentiments_with_cache(["bad", "new"], _loaded_model(), cache)
+
+    assert predicted_reviews[2:] == ["new"]
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (2, 3)
+    assert stats.hit_rate == pytest.approx(2 / 5)
+
+
+def test_new_model_version_invalidates_the_predictions(predicted_reviews):
+    cache = PredictionCache(max_size=10, ttl_seconds=0)
+    predict_sentiments_with_cache(["good"], _loaded_model("v1"), cache)
+
+    assert lookup_cached_sentiment("good", _loaded_model("v2"), cache) is None
+    predict_sentiments_with_cache(["good"], _loaded_model("v2"), cache)
+
+    assert predicted_reviews == ["good", "good"]
+    assert lookup_cached_sentiment("good", _loaded_model("v1"), cache) == "positive"
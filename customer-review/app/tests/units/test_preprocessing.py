@@ -0,0 +1,43 @@
+import pandas as pd
+
+from app.src.preprocessing import deduplicate_reviews
+
+
+def _reviews(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["review", "sentiment"])
+
+
+def test_duplicates_are_grouped_on_the_normalized_review():
+    df_reviews, report = deduplicate_reviews(
+        _reviews([("Great  food", 1), ("great food ", 1), ("GREAT FOOD", 1), ("Slow", 0)])
+    )
+
+    assert df_reviews["review"].tolist() == ["Great  food", "Slow"]
+    assert df_reviews["sentiment"].tolist() == [1, 0]
+    assert report.duplicates_removed == 2
+    assert report.conflicts.empty
+
+
+def test_majority_sentiment_is_kept_and_weighted():
+    df_reviews, report = deduplicate_reviews(
+        _reviews([("ok", 1), ("OK", 0), ("ok", 1), ("bad", 0)])
+    )
+
+    assert df_reviews.to_dict("records") == [
+        {"review": "ok", "sentiment": 1, "weight": 2.0},
+        {"review": "bad", "sentiment": 0, "weight": 1.0},
+    ]
+    assert report.duplicates_removed == 2
+
+
+def test_tied_duplicates_are_dropped_and_reported():
+    df_reviews, report = deduplicate_reviews(
+        _reviews([("meh", 1), ("Meh", 0), ("fine", 1), ("fine", 1), ("fine", 0)])
+    )
+
+    assert df_reviews["review"].tolist() == ["fine"]
+    assert report.duplicates_removed == 4
+    assert report.conflicts.to_dict("records") == [
+        {"review": "meh", "sentiment_count_0": 1, "sentiment_count_1": 1, "kept_sentiment": pd.NA},
+        {"review": "fine", "sentiment_count_0": 1, "sentiment_count_1": 2, "kept_sentiment": 1},
+    ]
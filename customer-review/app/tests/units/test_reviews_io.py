@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from app.src.config import SETTINGS
+from app.src.datamodels import ReviewsColumns, ReviewsSource, TrainingConfig, TrainingInput
+from app.src.reviews_io import (
+    convert_reviews_file_to_parquet,
+    load_training_reviews,
+    read_reviews_file,
+)
+
+
+@pytest.fixture(autouse=True)
+def reviews_data_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "reviews_data_root", str(tmp_path))
+    monkeypatch.setattr(SETTINGS, "reviews_allowed_buckets", ["reviews-bucket"])
+
+
+def _write_csv(tmp_path, rows: str) -> str:
+    file_path = tmp_path / "reviews.csv"
+    file_path.write_text("review,sentiment\n" + rows)
+    return str(file_path)
+
+
+def test_read_reviews_file_drops_missing_rows(tmp_path):
+    source = ReviewsSource(path=_write_csv(tmp_path, "good,1\nbad,\nok,0\n"))
+
+    df_reviews = read_reviews_file(source, chunk_size=2)
+
+    assert df_reviews["review"].tolist() == ["good", "ok"]
+    assert df_reviews["sentiment"].tolist() == [1, 0]
+
+
+def test_read_reviews_file_rejects_non_binary_sentiments(tmp_path):
+    file_path = _write_csv(tmp_path, "good,5\nbad,2\n")
+
+    with pytest.raises(ValueError, match="sentiments must be 0 or 1 in .*reviews.csv"):
+        read_reviews_file(ReviewsSource(path=file_path))
+
+
+def test_convert_reviews_file_to_parquet(tmp_path):
+    source = ReviewsSource(path=_write_csv(tmp_path, "good,1\nbad,0\n"))
+    parquet_path = str(tmp_path / "reviews.parquet")
+
+    assert convert_reviews_file_to_parquet(source, parquet_path) == 2
+    pd.testing.assert_frame_equal(
+        read_reviews_file(ReviewsSource(path=parquet_path)),
+        read_reviews_file(source),
+    )
+
+
+def test_convert_reviews_file_to_parquet_leaves_no_file_on_error(tmp_path):
+    source = ReviewsSource(path=_write_csv(tmp_path, "good,5\n"))
+    parquet_path = tmp_path / "reviews.parquet"
+
+    with pytest.raises(ValueError):
+        convert_reviews_file_to_parquet(source, str(parquet_path))
+    assert list(tmp_path.glob("reviews.parquet*")) == []
+
+
+def test_reviews_source_path_must_be_allowed(tmp_path):
+    file_path = _write_csv(tmp_path, "good,1\n")
+
+    assert ReviewsSource(path=file_path).path == file_path
+    assert ReviewsSource(path="gs://reviews-bucket/reviews.csv").path == "gs://reviews-bucket/reviews.csv"
+    for path in [
+        "app/data/Restaurant_Reviews.tsv",
+        str(tmp_path / ".." / "reviews.csv"),
+        "gs://other-bucket/reviews.csv",
+    ]:
+        with pytest.raises(ValidationError):
+            ReviewsSource(path=path)
+
+
+def test_to_frame_reads_the_reviews_source(tmp_path):
+    source = ReviewsSource(path=_write_csv(tmp_path, "good,1\nbad,0\n"))
+
+    pd.testing.assert_frame_equal(
+        TrainingInput(reviews_source=source).to_frame(),
+        read_reviews_file(source),
+    )
+
+
+def test_load_training_reviews_fails_when_deduplication_leaves_nothing():
+    inputs = TrainingInput(
+        reviews_columns=ReviewsColumns(review=["A", "a"], sentiment=[1, 0]),
+        training_config=TrainingConfig(deduplicate_reviews=True),
+    )
+
+    with pytest.raises(ValueError, match="no review left after the deduplication of 2 reviews"):
+        load_training_reviews(inputs, write_report=False)
+
+
+def test_replay_sample_is_seeded_and_mixed_with_the_new_reviews(tmp_path, monkeypatch):
+    replay_file_path = _write_csv(tmp_path, "".join(f"old {i},{i % 2}\n" for i in range(20)))
+    inputs = TrainingInput(
+        reviews_columns=ReviewsColumns(review=["new good", "new bad"], sentiment=[1, 0]),
+        fine_tune_saved_model=True,
+        replay_source=ReviewsSource(path=replay_file_path),
+        replay_sample_size=5,
+    )
+
+    df_reviews, _ = load_training_reviews(inputs, write_report=False)
+
+    assert df_reviews["review"].tolist()[:2] == ["new good", "new bad"]
+    replayed = df_reviews["review"].tolist()[2:]
+    assert len(set(replayed)) == 5
+    assert set(replayed) <= {f"old {i}" for i in range(20)}
+    # a resumed training replays the same reviews, the training seed draws them
+    pd.testing.assert_frame_equal(load_training_reviews(inputs, write_report=False)[0], df_reviews)
+    monkeypatch.setattr(SETTINGS, "training_seed", SETTINGS.training_seed + 1)
+    assert load_training_reviews(inputs, write_report=False)[0]["review"].tolist()[2:] != replayed
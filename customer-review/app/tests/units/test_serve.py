@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+
+from app import serve
+from app.src.training_jobs import try_acquire_training_lock
+
+
+def _fork_idle_worker() -> int:
+    pid = os.fork()
+    if pid == 0:
+        time.sleep(60)
+        os._exit(0)
+    return pid
+
+
+def _is_running(pid: int) -> bool:
+    # the worker is reaped once stopped
+    try:
+        return os.waitpid(pid, os.WNOHANG) == (0, 0)
+    except ChildProcessError:
+        return False
+
+
+def test_worker_is_not_stopped_while_a_training_holds_the_node_lock(tmp_path, monkeypatch):
+    jobs_path = str(tmp_path)
+    monkeypatch.setattr(serve, "_WAIT_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(
+        serve, "try_acquire_training_lock", lambda: try_acquire_training_lock(jobs_path)
+    )
+    # forked before the lock is taken, as serve does : it must not inherit it
+    worker_pid = _fork_idle_worker()
+    training_lock = try_acquire_training_lock(jobs_path)
+
+    stopping = threading.Thread(
+        target=serve._stop_worker_without_training, args=(worker_pid, lambda: False)
+    )
+    stopping.start()
+    time.sleep(0.5)
+    assert _is_running(worker_pid)
+
+    # the training exits : the worker is stopped
+    training_lock.close()
+    stopping.join(5)
+    assert not stopping.is_alive()
+    assert not _is_running(worker_pid)
+
+
+def test_waiting_for_the_node_lock_stops_on_shutdown(tmp_path, monkeypatch):
+    jobs_path = str(tmp_path)
+    monkeypatch.setattr(
+        serve, "try_acquire_training_lock", lambda: try_acquire_training_lock(jobs_path)
+    )
+    worker_pid = _fork_idle_worker()
+    training_lock = try_acquire_training_lock(jobs_path)
+    try:
+        assert not serve._stop_worker_without_training(worker_pid, lambda: True)
+        assert _is_running(worker_pid)
+    finally:
+        training_lock.close()
+        serve._stop_worker(worker_pid)
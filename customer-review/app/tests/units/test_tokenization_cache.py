@@ -0,0 +1,78 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from transformers import BertTokenizerFast
+
+from app.src.tokenization_cache import TokenizationCache
+from app.tests.helpers.tiny_bert import TINY_BERT_WORDS
+
+_REVIEWS = ["good food", "awful service"]
+
+
+def _tokenizer(vocab_path: str, words) -> BertTokenizerFast:
+    with open(vocab_path, "w") as vocab_file:
+        vocab_file.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+    return BertTokenizerFast(vocab_file=vocab_path)
+
+
+@pytest.fixture
+def tokenizer(tmp_path) -> BertTokenizerFast:
+    return _tokenizer(str(tmp_path / "vocab.txt"), TINY_BERT_WORDS)
+
+
+def _set_last_used(cache: TokenizationCache, key: str, seconds_ago: float) -> None:
+    mtime = time.time() - seconds_ago
+    os.utime(os.path.join(cache.cache_path, key), (mtime, mtime))
+
+
+def test_same_reviews_and_tokenizer_hit(tmp_path, tokenizer):
+    cache = TokenizationCache(cache_path=str(tmp_path / "cache"), max_entries=2)
+    key = TokenizationCache.make_key(_REVIEWS, tokenizer, 16)
+    cache.save(key, "lengths", np.array([4, 4]))
+
+    # a tokenizer loaded again from the same vocabulary, with another truncation
+    same_tokenizer = _tokenizer(str(tmp_path / "same_vocab.txt"), TINY_BERT_WORDS)
+    same_tokenizer(_REVIEWS, truncation=True, max_length=3)
+    same_key = TokenizationCache.make_key(list(_REVIEWS), same_tokenizer, 16)
+
+    assert same_key == key
+    assert cache.load(same_key, "lengths").tolist() == [4, 4]
+    assert cache.load(same_key, "token_ids") is None
+
+
+def test_other_reviews_tokenizer_or_truncation_length_miss(tmp_path, tokenizer):
+    other_tokenizer = _tokenizer(str(tmp_path / "other_vocab.txt"), TINY_BERT_WORDS[::-1])
+    key = TokenizationCache.make_key(_REVIEWS, tokenizer, 16)
+
+    assert TokenizationCache.make_key(["good food", "awful"], tokenizer, 16) != key
+    # length prefixed, the reviews are not just concatenated
+    assert TokenizationCache.make_key(["good foo", "dawful service"], tokenizer, 16) != key
+    assert TokenizationCache.make_key(_REVIEWS, other_tokenizer, 16) != key
+    assert TokenizationCache.make_key(_REVIEWS, tokenizer, 32) != key
+
+
+def test_least_recently_used_dataset_is_evicted(tmp_path):
+    cache = TokenizationCache(cache_path=str(tmp_path / "cache"), max_entries=2)
+    cache.save("first", "lengths", np.array([1]))
+    cache.save("second", "lengths", np.array([2]))
+    _set_last_used(cache, "first", 100)
+    _set_last_used(cache, "second", 50)
+
+    # the first dataset is used again, the second one is now the least recently used
+    assert cache.load("first", "lengths").tolist() == [1]
+    cache.save("third", "lengths", np.array([3]))
+
+    assert sorted(os.listdir(cache.cache_path)) == ["first", "third"]
+    assert cache.load("second", "lengths") is None
+
+
+def test_cache_is_disabled_without_entries(tmp_path):
+    cache = TokenizationCache(cache_path=str(tmp_path / "cache"), max_entries=0)
+
+    cache.save("first", "lengths", np.array([1]))
+
+    assert not cache.enabled
+    assert not os.path.exists(cache.cache_path)
+    assert cache.load("first", "lengths") is None
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app.src.datamodels import JobStatusEnum, ReviewsColumns, TrainingInput
+from app.src.training_checkpoints import CHECKPOINT_FILE_NAME, prune_checkpoints
+from app.src.training_jobs import (
+    TRAINING_LOCK_FILE_NAME,
+    TrainingJobAlreadyRunningError,
+    TrainingJobManager,
+    is_training_job_running,
+    prune_training_jobs,
+    read_training_job,
+    try_acquire_training_lock,
+)
+
+_DAY = 24 * 3600
+
+
+def _training_input() -> TrainingInput:
+    return TrainingInput(reviews_columns=ReviewsColumns(review=["good", "bad"], sentiment=[1, 0]))
+
+
+def test_no_training_job_is_submitted_while_the_node_lock_is_held(tmp_path):
+    jobs_path = str(tmp_path)
+    lock_file = try_acquire_training_lock(jobs_path)
+
+    assert lock_file is not None
+    assert try_acquire_training_lock(jobs_path) is None
+    assert is_training_job_running(jobs_path)
+    with pytest.raises(TrainingJobAlreadyRunningError):
+        TrainingJobManager(jobs_path=jobs_path).submit(_training_input())
+
+    lock_file.close()
+    assert not is_training_job_running(jobs_path)
+
+
+def test_job_that_failed_to_start_is_marked_failed(tmp_path, monkeypatch):
+    def start(process):
+        raise OSError("cannot spawn")
+
+    monkeypatch.setattr(multiprocessing.context.SpawnProcess, "start", start)
+    jobs_path = str(tmp_path)
+
+    with pytest.raises(OSError):
+        TrainingJobManager(jobs_path=jobs_path).submit(_training_input())
+
+    (job_file_name,) = [x for x in os.listdir(jobs_path) if x.endswith(".json")]
+    job = read_training_job(job_file_name[: -len(".json")], jobs_path)
+    assert job.job_status == JobStatusEnum.failed
+    assert job.error == "OSError('cannot spawn')"
+    assert job.timestamp_end is not None
+    assert not is_training_job_running(jobs_path)
+
+
+def _touch(file_path: str, age_seconds: float) -> None:
+    with open(file_path, "w"):
+        pass
+    mtime = time.time() - age_seconds
+    os.utime(file_path, (mtime, mtime))
+
+
+def test_job_files_older_than_the_retention_are_pruned(tmp_path):
+    old_job, recent_job = "a" * 32, "b" * 32
+    _touch(str(tmp_path / f"{old_job}.json"), 8 * _DAY)
+    _touch(str(tmp_path / f"{old_job}.json.tmp"), 8 * _DAY)
+    _touch(str(tmp_path / f"{recent_job}.json"), 6 * _DAY)
+    _touch(str(tmp_path / TRAINING_LOCK_FILE_NAME), 8 * _DAY)
+
+    prune_training_jobs(7 * _DAY, str(tmp_path))
+
+    assert sorted(os.listdir(tmp_path)) == [f"{recent_job}.json", TRAINING_LOCK_FILE_NAME]
+
+
+def test_checkpoints_of_stale_runs_are_pruned(tmp_path):
+    for run_key, age_in_days in [("stale", 8), ("recent", 6)]:
+        (tmp_path / run_key).mkdir()
+        _touch(str(tmp_path / run_key / CHECKPOINT_FILE_NAME), age_in_days * _DAY)
+        mtime = time.time() - age_in_days * _DAY
+        os.utime(tmp_path / run_key, (mtime, mtime))
+
+    prune_checkpoints(7 * _DAY, str(tmp_path))
+
+    assert os.listdir(tmp_path) == ["recent"]